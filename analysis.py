@@ -0,0 +1,193 @@
+import math
+import string
+import time
+from collections import namedtuple
+
+import ciphers
+
+# Cryptanalysis for the ciphers in ciphers.py
+# Scores are "lower is better" so candidates can always be ranked ascending.
+
+# Relative frequencies of A-Z in English text
+ENGLISH_FREQUENCIES = [
+    0.08167, 0.01492, 0.02782, 0.04253, 0.12702, 0.02228, 0.02015, 0.06094, 0.06966,
+    0.00153, 0.00772, 0.04025, 0.02406, 0.06749, 0.07507, 0.01929, 0.00095, 0.05987,
+    0.06327, 0.09056, 0.02758, 0.00978, 0.02360, 0.00150, 0.01974, 0.00074,
+]
+_ENGLISH_LOGS = [math.log(frequency) for frequency in ENGLISH_FREQUENCIES]
+
+# Multipliers with an inverse modulo 26
+AFFINE_MULTIPLIERS = [a for a in range(1, 26) if math.gcd(a, 26) == 1]
+
+Candidate = namedtuple('Candidate', 'key score')
+
+def letter_counts(text):
+    # Histogram of the uppercase letters A-Z, the only ones the ciphers change
+    return [text.count(letter) for letter in string.ascii_uppercase]
+
+def chi_squared(counts):
+    # counts[p] is how often plaintext letter p occurs
+    total = sum(counts)
+    if not total:
+        return 0.0
+    score = 0.0
+    for count, frequency in zip(counts, ENGLISH_FREQUENCIES):
+        expected = total * frequency
+        score += (count - expected) ** 2 / expected
+    return score
+
+def negative_log_likelihood(counts):
+    # Per-letter negative log-likelihood of counts under English frequencies
+    total = sum(counts)
+    if not total:
+        return 0.0
+    return -sum(count * log for count, log in zip(counts, _ENGLISH_LOGS)) / total
+
+STATISTICS = {
+    'chi-squared': chi_squared,
+    'log-likelihood': negative_log_likelihood,
+}
+
+def _rank_affine(counts, keys, statistic):
+    # Score every key (a, b) from the ciphertext histogram alone: plaintext
+    # letter p was enciphered as (a * p + b) % 26, so its count is read from
+    # there instead of decrypting the text
+    score = STATISTICS[statistic]
+    candidates = []
+    for key, a, b in keys:
+        plain_counts = [counts[(a * p + b) % 26] for p in range(26)]
+        candidates.append(Candidate(key, score(plain_counts)))
+    candidates.sort(key=lambda candidate: candidate.score)
+    return candidates
+
+def crack_additive(ciphertext, statistic='chi-squared', counts=None):
+    # All 26 additive keys, best first
+    counts = counts or letter_counts(ciphertext)
+    return _rank_affine(counts, [(key, 1, key) for key in range(26)], statistic)
+
+def crack_affine(ciphertext, statistic='chi-squared', counts=None):
+    # All 312 affine keys (a, b), best first
+    counts = counts or letter_counts(ciphertext)
+    keys = [((a, b), a, b) for a in AFFINE_MULTIPLIERS for b in range(26)]
+    return _rank_affine(counts, keys, statistic)
+
+# Vigenère
+# The key advances on every character, so columns are taken over all text
+# positions and only the uppercase letters in them are counted.
+VigenereSolution = namedtuple('VigenereSolution', 'key plaintext key_length lengths timings')
+KeyLength = namedtuple('KeyLength', 'length coincidence kasiski')
+
+KASISKI_SAMPLE = 1 << 17
+KASISKI_MIN_REPEATS = 20
+
+def _letter_codes(text, other):
+    # One byte per character: 0-25 for A-Z, other for everything else
+    table = bytes(code - 65 if 65 <= code <= 90 else other for code in range(256))
+    return text.encode('ascii', 'replace').translate(table)
+
+def coincidence_profile(codes, max_shift):
+    # For each shift s, count letter pairs s apart and how many of them are
+    # equal. Each shift is one big-integer XOR over the whole sample, so every
+    # candidate length is scored without re-slicing the text.
+    n = len(codes)
+    left = int.from_bytes(codes, 'little')
+    right = int.from_bytes(codes.translate(bytes(range(26)) + bytes([27] * 230)), 'little')
+    mask = int.from_bytes(codes.translate(bytes([1] * 26) + bytes(230)), 'little')
+    matches = [0] * (max_shift + 1)
+    pairs = [0] * (max_shift + 1)
+    for shift in range(1, min(max_shift, n - 1) + 1):
+        size = n - shift
+        matches[shift] = ((left >> (8 * shift)) ^ right).to_bytes(n, 'little')[:size].count(0)
+        pairs[shift] = ((mask >> (8 * shift)) & mask).to_bytes(n, 'little')[:size].count(1)
+    return matches, pairs
+
+def kasiski_support(codes, max_length):
+    # support[L] is the share of repeated-trigram distances divisible by L,
+    # scaled so that chance gives about 1
+    last_seen = {}
+    distances = [0] * len(codes)
+    repeats = 0
+    for i in range(len(codes) - 2):
+        trigram = codes[i:i + 3]
+        if max(trigram) > 25:
+            continue
+        previous = last_seen.get(trigram)
+        if previous is not None:
+            distances[i - previous] += 1
+            repeats += 1
+        last_seen[trigram] = i
+    support = [0.0] * (max_length + 1)
+    if repeats:
+        for length in range(1, max_length + 1):
+            support[length] = sum(distances[length::length]) / repeats * length
+    return support, repeats
+
+def vigenere_key_lengths(ciphertext, max_length=200, sample_size=1 << 18, timings=None):
+    # Rank key lengths 1..max_length, most likely first
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    codes = _letter_codes(ciphertext[:sample_size], 26)
+    timings['prepare'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    support, repeats = kasiski_support(codes[:KASISKI_SAMPLE], max_length)
+    timings['kasiski'] = time.perf_counter() - start
+
+    # Letters a multiple of the key length apart coincide at the English rate,
+    # the rest at a lower rate. Score each length by how many standard errors
+    # its multiples sit above the other shifts: the true length beats its
+    # multiples (fewer shifts) and its divisors (diluted rate).
+    start = time.perf_counter()
+    matches, pairs = coincidence_profile(codes, max_length)
+    total_matches, total_pairs = sum(matches), sum(pairs)
+    lengths = []
+    for length in range(1, max_length + 1):
+        hits, tries = sum(matches[length::length]), sum(pairs[length::length])
+        if not tries:
+            lengths.append(KeyLength(length, 0.0, support[length]))
+            continue
+        # Length 1 has no other shifts to compare with, so use uniform letters
+        rest = total_pairs - tries
+        baseline = (total_matches - hits) / rest if rest else 1 / 26
+        baseline = min(max(baseline, 1e-6), 1 - 1e-6)
+        z = (hits / tries - baseline) / math.sqrt(baseline * (1 - baseline) / tries)
+        lengths.append(KeyLength(length, z, support[length]))
+    timings['coincidence'] = time.perf_counter() - start
+
+    # With enough repeated trigrams, Kasiski must also put a length above chance
+    def plausible(candidate):
+        return repeats < KASISKI_MIN_REPEATS or candidate.kasiski >= 1
+    lengths.sort(key=lambda candidate: (not plausible(candidate), -candidate.coincidence))
+    return lengths
+
+def vigenere_column_shifts(ciphertext, key_length, statistic='chi-squared'):
+    # Best additive shift for each key position, from per-column histograms
+    codes = _letter_codes(ciphertext, 26)
+    shifts = []
+    for column in range(key_length):
+        values = codes[column::key_length]
+        counts = [values.count(letter) for letter in range(26)]
+        shifts.append(crack_additive(None, statistic, counts)[0].key)
+    return shifts
+
+def solve_vigenere(ciphertext, key_length=None, max_length=200, sample_size=1 << 18, statistic='chi-squared'):
+    # Recover the key with the estimated (or given) length; timings holds
+    # seconds spent in each stage
+    if key_length is not None and key_length < 1:
+        raise ValueError("key_length must be at least 1")
+    if max_length < 1:
+        raise ValueError("max_length must be at least 1")
+    timings = {}
+    lengths = []
+    if key_length is None:
+        lengths = vigenere_key_lengths(ciphertext, max_length, sample_size, timings)
+        key_length = lengths[0].length
+
+    start = time.perf_counter()
+    key = ''.join(chr(65 + shift) for shift in vigenere_column_shifts(ciphertext, key_length, statistic))
+    timings['columns'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plaintext = ciphers.vigenere_decrypt(ciphertext, key)
+    timings['decrypt'] = time.perf_counter() - start
+    return VigenereSolution(key, plaintext, key_length, lengths, timings)
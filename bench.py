@@ -0,0 +1,205 @@
+import argparse
+import gc
+import json
+import platform
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+import ciphers
+
+# Benchmarks for the cipher engines in ciphers.py
+# Usage: python bench.py autokey [--max-size BYTES]
+#        python bench.py suite [--max-size BYTES] [--cipher NAME] [--out FILE]
+#                              [--baseline FILE] [--threshold FRACTION]
+
+SIZES = [100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000]
+
+def random_text(size, seed=0):
+    # Repeat one random block so building 100 MB inputs stays cheap
+    rnd = random.Random(seed)
+    block = ''.join(rnd.choice(string.ascii_uppercase) for _ in range(min(size, 1 << 16)))
+    return (block * (size // len(block) + 1))[:size]
+
+def bench_autokey(sizes, key='QUEENLY', chunk_size=ciphers.CHUNK_SIZE):
+    # Per-character decrypt cost should stay flat as the input grows
+    context = ciphers.AutokeyContext(key)
+    results = []
+    for size in sizes:
+        ciphertext = random_text(size)
+
+        start = time.perf_counter()
+        context.decrypt(ciphertext)
+        batch = time.perf_counter() - start
+
+        stream = context.decryptor()
+        start = time.perf_counter()
+        for i in range(0, size, chunk_size):
+            stream.update(ciphertext[i:i + chunk_size])
+        feed = time.perf_counter() - start
+
+        results.append({
+            'size': size,
+            'batch_ns_per_char': batch / size * 1e9,
+            'feed_ns_per_char': feed / size * 1e9,
+        })
+    return results
+
+def print_autokey(results):
+    print(f"{'size':>12}  {'batch ns/char':>14}  {'feed ns/char':>13}")
+    for row in results:
+        print(f"{row['size']:>12}  {row['batch_ns_per_char']:>14.1f}  {row['feed_ns_per_char']:>13.1f}")
+
+# Suite
+# Every cipher's encrypt and decrypt function at every size, and for keyed
+# ciphers at short, medium and long keys: long autokey keys, Playfair keys
+# and transposition grids of up to 26 columns are the cases most likely to
+# regress. Decryption runs on the matching encryption output. Throughput is
+# the best of repeated calls within MIN_TIME; peak memory is what one more
+# call allocates under tracemalloc, inputs not included.
+MIN_TIME = 0.2
+REPEATS = 20
+KEY_LENGTHS = {
+    'autokey': (3, 16, 256),
+    'vigenere': (3, 16, 256),
+    'playfair': (3, 10, 25),
+    'keyed_transposition': (3, 10, 26),
+    'double_transposition': (3, 10, 26),
+}
+_INT_KEYS = {'additive': [7], 'multiplicative': [5], 'affine': [5, 8]}
+
+def letter_key(length, unique, seed=0, letters=string.ascii_uppercase):
+    rnd = random.Random(seed + length)
+    if unique:
+        return ''.join(rnd.sample(letters, length))
+    return ''.join(rnd.choice(letters) for _ in range(length))
+
+def suite_cases(names=None):
+    # (cipher, key length or None, key values)
+    for name in names or ciphers.CIPHERS:
+        if name in _INT_KEYS:
+            yield name, None, _INT_KEYS[name]
+        elif name == 'monoalphabetic':
+            yield name, 26, [letter_key(26, True)]
+        elif name == 'keyless_transposition':
+            yield name, None, []
+        else:
+            unique = 'transposition' in name or name == 'playfair'
+            # A J in a Playfair key would make a 26th cell
+            letters = string.ascii_uppercase.replace('J', '') if name == 'playfair' else string.ascii_uppercase
+            for length in KEY_LENGTHS[name]:
+                yield name, length, [letter_key(length, unique, i, letters)
+                                     for i in range(len(ciphers.CIPHERS[name].params))]
+
+def _time_call(function, *args):
+    # Garbage collection is off while timing, as in timeit
+    best, total, runs = float('inf'), 0.0, 0
+    gc.collect()
+    gc.disable()
+    try:
+        while runs < REPEATS and (runs == 0 or total < MIN_TIME):
+            start = time.perf_counter()
+            function(*args)
+            elapsed = time.perf_counter() - start
+            best, total, runs = min(best, elapsed), total + elapsed, runs + 1
+    finally:
+        gc.enable()
+    return best
+
+def _peak_memory(function, *args):
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench_suite(sizes, names=None, memory=True, report=None):
+    results = []
+    for name, key_length, key in suite_cases(names):
+        cipher = ciphers.CIPHERS[name]
+        for size in sizes:
+            plaintext = random_text(size)
+            ciphertext = cipher.encrypt(plaintext, *key)
+            for command, function, text in (('encrypt', cipher.encrypt, plaintext),
+                                            ('decrypt', cipher.decrypt, ciphertext)):
+                elapsed = _time_call(function, text, *key)
+                row = {
+                    'cipher': name,
+                    'command': command,
+                    'key_length': key_length,
+                    'size': len(text),
+                    'mb_per_s': round(len(text) / 1e6 / elapsed, 3) if elapsed else None,
+                    'peak_bytes': _peak_memory(function, text, *key) if memory else None,
+                }
+                results.append(row)
+                if report:
+                    report(row)
+    return results
+
+def _case(row):
+    return row['cipher'], row['command'], row['key_length'], row['size']
+
+def compare(results, baseline, threshold, min_size=0):
+    # Rows of at least min_size characters that are slower than baseline by
+    # more than threshold (a fraction)
+    previous = {_case(row): row for row in baseline}
+    regressions = []
+    for row in results:
+        old = previous.get(_case(row)) if row['size'] >= min_size else None
+        if old and old['mb_per_s'] and row['mb_per_s'] is not None:
+            change = row['mb_per_s'] / old['mb_per_s'] - 1
+            if change < -threshold:
+                regressions.append(dict(row, baseline_mb_per_s=old['mb_per_s'], change=round(change, 3)))
+    return regressions
+
+def print_row(row):
+    key_length = '-' if row['key_length'] is None else row['key_length']
+    peak = '-' if row['peak_bytes'] is None else f"{row['peak_bytes'] / 1e6:.1f}"
+    print(f"{row['cipher']:>22} {row['command']:>8} {key_length:>4} {row['size']:>10} "
+          f"{row['mb_per_s']:>10.2f} MB/s {peak:>8} MB peak", file=sys.stderr)
+
+def main_bench(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the cipher engines in ciphers.py")
+    parser.add_argument('benchmark', choices=['autokey', 'suite'])
+    parser.add_argument('--max-size', type=int, default=SIZES[-1], help="largest input size in characters")
+    parser.add_argument('--cipher', action='append', choices=list(ciphers.CIPHERS),
+                        help="suite: benchmark only this cipher (repeatable)")
+    parser.add_argument('--out', help="suite: write the results as JSON here (default: stdout)")
+    parser.add_argument('--baseline', help="suite: JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="suite: fail when throughput drops by more than this fraction (default: 0.2)")
+    parser.add_argument('--gate-min-size', type=int, default=10_000,
+                        help="suite: only inputs of at least this many characters can fail the comparison; "
+                             "smaller ones mostly time call overhead (default: 10000)")
+    parser.add_argument('--no-memory', action='store_true', help="suite: skip the peak memory runs")
+    options = parser.parse_args(argv)
+    sizes = [size for size in SIZES if size <= options.max_size]
+    if options.benchmark == 'autokey':
+        print_autokey(bench_autokey(sizes))
+        return 0
+
+    results = bench_suite(sizes, options.cipher, not options.no_memory, print_row)
+    document = {'python': platform.python_version(), 'machine': platform.machine(), 'results': results}
+    regressions = []
+    if options.baseline:
+        with open(options.baseline) as f:
+            regressions = compare(results, json.load(f)['results'], options.threshold, options.gate_min_size)
+        document['baseline'] = options.baseline
+        document['regressions'] = regressions
+    if options.out:
+        with open(options.out, 'w') as f:
+            json.dump(document, f, indent=1)
+    else:
+        json.dump(document, sys.stdout, indent=1)
+        print()
+    for row in regressions:
+        print(f"Regression: {row['cipher']} {row['command']} key length {row['key_length']} size {row['size']}: "
+              f"{row['mb_per_s']} MB/s vs {row['baseline_mb_per_s']} MB/s ({row['change']:+.0%})", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
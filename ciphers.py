@@ -0,0 +1,1642 @@
+import math
+import os
+import sys
+import time
+from bisect import bisect_right
+from functools import lru_cache
+
+from registry import CIPHERS
+
+# The cipher engines. registry.py declares the ciphers and main.py is the
+# command line; this module is imported on first use of a cipher. Modules
+# only some paths need (re, mmap, array, concurrent.futures) are imported
+# where they are used.
+
+# Helper functions
+def mod_inverse(a, m):
+    if m < 2:
+        return None
+    try:
+        return pow(a, -1, m)
+    except ValueError:
+        return None
+
+# Utility function to clean text (remove spaces and convert to uppercase)
+def clean_text(text):
+    return text.replace(' ', '').upper()
+
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+# Alphabets
+# The substitution and Vigenère-family ciphers work on indices into an
+# alphabet. UPPERCASE is the classic A-Z fast path: any uppercase character,
+# not only A-Z, is mapped through (ord(char) - 65) % 26 as the ciphers always
+# have. Other alphabets change only their own characters and leave the rest.
+class Alphabet:
+    __slots__ = ('letters', 'size', 'index', 'inverses', 'is_uppercase')
+
+    def __init__(self, letters):
+        if len(letters) < 2 or len(set(letters)) != len(letters):
+            raise ValueError("An alphabet needs at least two unique characters")
+        self.letters = letters
+        self.size = len(letters)
+        self.index = {char: i for i, char in enumerate(letters)}
+        # inverses[a] is the inverse of a modulo size, or None
+        self.inverses = [mod_inverse(a, self.size) for a in range(self.size)]
+        self.is_uppercase = letters == LETTERS
+
+    def __eq__(self, other):
+        return isinstance(other, Alphabet) and other.letters == self.letters
+
+    def __hash__(self):
+        return hash(self.letters)
+
+    def __repr__(self):
+        return f"Alphabet({self.letters!r})"
+
+    def clean_key(self, key):
+        # Keys for A-Z are cleaned like text; other alphabets take them as given
+        return clean_text(key) if self.is_uppercase else key
+
+    def shift(self, char):
+        # Index of a key character
+        if self.is_uppercase:
+            return (ord(char) - 65) % 26
+        try:
+            return self.index[char]
+        except KeyError:
+            raise ValueError(f"{char!r} is not in the alphabet") from None
+
+UPPERCASE = Alphabet(LETTERS)
+PRINTABLE = Alphabet(''.join(map(chr, range(32, 127))))
+ALPHABETS = {'uppercase': UPPERCASE, 'printable': PRINTABLE}
+
+# Translation table engine
+# Additive, multiplicative and affine ciphers all map letter index i to
+# (a * i + b) % n, so each key compiles once into a str.translate table.
+TABLE_CACHE_SIZE = 256
+
+class _TranslationTable(dict):
+    # Precomputed for the first 256 code points; any other character is
+    # resolved on first sight with the same isupper() rule the ciphers use
+    __slots__ = ('mapping',)
+
+    def __init__(self, mapping):
+        super().__init__()
+        self.mapping = mapping
+        for code in range(256):
+            self[code] = self._lookup(code)
+
+    def _lookup(self, code):
+        if chr(code).isupper():
+            return self.mapping[(code - 65) % 26] + 65
+        return code
+
+    def __missing__(self, code):
+        value = self[code] = self._lookup(code)
+        return value
+
+def _affine_params(cipher, key):
+    if cipher == 'additive':
+        return 1, key
+    if cipher == 'multiplicative':
+        return key, 0
+    if cipher == 'affine':
+        return key
+    raise ValueError(f"Unknown cipher: {cipher}")
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def translation_table(cipher, key, direction, alphabet=UPPERCASE):
+    # Compile (cipher, key, direction) into a table for str.translate
+    letters, n = alphabet.letters, alphabet.size
+    if cipher == 'monoalphabetic':
+        if direction == 'encrypt':
+            return str.maketrans(letters, key)
+        return str.maketrans(key, letters)
+    a, b = _affine_params(cipher, key)
+    if direction == 'decrypt':
+        inv_a = alphabet.inverses[a % n]
+        if inv_a is None:
+            raise ValueError(f"Key {a} has no inverse modulo {n}")
+        a, b = inv_a, -inv_a * b
+    mapping = [(a * i + b) % n for i in range(n)]
+    if alphabet.is_uppercase:
+        return _TranslationTable(mapping)
+    return str.maketrans(letters, ''.join([letters[i] for i in mapping]))
+
+# Keyed cipher contexts
+# A context derives its key schedule once; the module-level functions below
+# are thin wrappers that fetch a cached context for the key they are given.
+CONTEXT_CACHE_SIZE = 128
+
+class CipherContext:
+    __slots__ = ()
+
+    def encrypt_many(self, texts):
+        encrypt = self.encrypt
+        return [encrypt(text) for text in texts]
+
+    def decrypt_many(self, texts):
+        decrypt = self.decrypt
+        return [decrypt(text) for text in texts]
+
+    # Bytes path: ciphers without a byte engine of their own go through str
+    def encrypt_bytes(self, data):
+        return self.encrypt(_as_bytes(data).decode('utf-8', 'surrogateescape')).encode('utf-8', 'surrogateescape')
+
+    def decrypt_bytes(self, data):
+        return self.decrypt(_as_bytes(data).decode('utf-8', 'surrogateescape')).encode('utf-8', 'surrogateescape')
+
+@lru_cache(maxsize=CONTEXT_CACHE_SIZE)
+def cipher_context(cls, *key):
+    return cls(*key)
+
+class _TableContext(CipherContext):
+    __slots__ = ('encrypt_table', 'decrypt_table')
+
+    def encrypt(self, plaintext):
+        return plaintext.translate(self.encrypt_table)
+
+    def decrypt(self, ciphertext):
+        if self.decrypt_table is None:
+            raise ValueError("Key has no inverse modulo the alphabet size")
+        return ciphertext.translate(self.decrypt_table)
+
+    def encryptor(self):
+        return _TableStream(self.encrypt_table)
+
+    def decryptor(self):
+        if self.decrypt_table is None:
+            raise ValueError("Key has no inverse modulo the alphabet size")
+        return _TableStream(self.decrypt_table)
+
+    def encrypt_bytes(self, data):
+        return _as_bytes(data).translate(byte_table(self.encrypt_table))
+
+    def decrypt_bytes(self, data):
+        return self.byte_decryptor().update(data)
+
+    def byte_encryptor(self):
+        return _ByteTableStream(byte_table(self.encrypt_table))
+
+    def byte_decryptor(self):
+        if self.decrypt_table is None:
+            raise ValueError("Key has no inverse modulo the alphabet size")
+        return _ByteTableStream(byte_table(self.decrypt_table))
+
+# Ciphers Implementation
+
+# 1. Additive Cipher
+class AdditiveContext(_TableContext):
+    __slots__ = ()
+
+    def __init__(self, key, alphabet=UPPERCASE):
+        self.encrypt_table = translation_table('additive', key % alphabet.size, 'encrypt', alphabet)
+        self.decrypt_table = translation_table('additive', key % alphabet.size, 'decrypt', alphabet)
+
+def additive_encrypt(plaintext, key, alphabet=UPPERCASE):
+    return cipher_context(AdditiveContext, key, alphabet).encrypt(plaintext)
+
+def additive_decrypt(ciphertext, key, alphabet=UPPERCASE):
+    return cipher_context(AdditiveContext, key, alphabet).decrypt(ciphertext)
+
+# 2. Multiplicative Cipher
+class MultiplicativeContext(_TableContext):
+    __slots__ = ()
+
+    def __init__(self, key, alphabet=UPPERCASE):
+        key %= alphabet.size
+        self.encrypt_table = translation_table('multiplicative', key, 'encrypt', alphabet)
+        self.decrypt_table = None
+        if alphabet.inverses[key] is not None:
+            self.decrypt_table = translation_table('multiplicative', key, 'decrypt', alphabet)
+
+def multiplicative_encrypt(plaintext, key, alphabet=UPPERCASE):
+    return cipher_context(MultiplicativeContext, key, alphabet).encrypt(plaintext)
+
+def multiplicative_decrypt(ciphertext, key, alphabet=UPPERCASE):
+    context = cipher_context(MultiplicativeContext, key, alphabet)
+    if context.decrypt_table is None:
+        return "Invalid key"
+    return context.decrypt(ciphertext)
+
+# 3. Affine Cipher
+class AffineContext(_TableContext):
+    __slots__ = ()
+
+    def __init__(self, a, b, alphabet=UPPERCASE):
+        key = (a % alphabet.size, b % alphabet.size)
+        self.encrypt_table = translation_table('affine', key, 'encrypt', alphabet)
+        self.decrypt_table = None
+        if alphabet.inverses[key[0]] is not None:
+            self.decrypt_table = translation_table('affine', key, 'decrypt', alphabet)
+
+def affine_encrypt(plaintext, a, b, alphabet=UPPERCASE):
+    return cipher_context(AffineContext, a, b, alphabet).encrypt(plaintext)
+
+def affine_decrypt(ciphertext, a, b, alphabet=UPPERCASE):
+    context = cipher_context(AffineContext, a, b, alphabet)
+    if context.decrypt_table is None:
+        return "Invalid key"
+    return context.decrypt(ciphertext)
+
+# 4. Monoalphabetic Substitution Cipher
+class MonoalphabeticContext(_TableContext):
+    __slots__ = ()
+
+    def __init__(self, key, alphabet=UPPERCASE):
+        self.encrypt_table = translation_table('monoalphabetic', key, 'encrypt', alphabet)
+        self.decrypt_table = translation_table('monoalphabetic', key, 'decrypt', alphabet)
+
+def monoalphabetic_encrypt(plaintext, key, alphabet=UPPERCASE):
+    return cipher_context(MonoalphabeticContext, key, alphabet).encrypt(plaintext)
+
+def monoalphabetic_decrypt(ciphertext, key, alphabet=UPPERCASE):
+    return cipher_context(MonoalphabeticContext, key, alphabet).decrypt(ciphertext)
+
+# 5. Autokey Cipher
+class AutokeyContext(CipherContext):
+    __slots__ = ('key', 'alphabet')
+
+    def __init__(self, key, alphabet=UPPERCASE):
+        self.key = alphabet.clean_key(key)
+        self.alphabet = alphabet
+        if not alphabet.is_uppercase:
+            for char in self.key:
+                alphabet.shift(char)
+
+    def encrypt(self, plaintext):
+        return self.encryptor().update(plaintext)
+
+    def decrypt(self, ciphertext):
+        return self.decryptor().update(ciphertext)
+
+    def encryptor(self):
+        if not self.alphabet.is_uppercase:
+            return _AlphabetAutokeyStream(self.key, self.alphabet, 1)
+        return _AutokeyEncryptStream(self.key)
+
+    def decryptor(self):
+        if not self.alphabet.is_uppercase:
+            return _AlphabetAutokeyStream(self.key, self.alphabet, -1)
+        return _AutokeyDecryptStream(self.key)
+
+    def encrypt_bytes(self, data):
+        return self.byte_encryptor().update(data)
+
+    def decrypt_bytes(self, data):
+        return self.byte_decryptor().update(data)
+
+    def byte_encryptor(self):
+        return _AutokeyByteStream(self.key, self.alphabet, 1)
+
+    def byte_decryptor(self):
+        return _AutokeyByteStream(self.key, self.alphabet, -1)
+
+def autokey_encrypt(plaintext, key, alphabet=UPPERCASE):
+    return cipher_context(AutokeyContext, key, alphabet).encrypt(plaintext)
+
+def autokey_decrypt(ciphertext, key, alphabet=UPPERCASE):
+    return cipher_context(AutokeyContext, key, alphabet).decrypt(ciphertext)
+
+# 6. Vigenère Cipher
+class _PeriodicContext(CipherContext):
+    # One table per key position; each position's characters are translated
+    # as a single strided slice. decrypt_tables is None when a table has no
+    # inverse.
+    __slots__ = ('encrypt_tables', 'decrypt_tables')
+
+    def __init__(self, encrypt_tables, decrypt_tables):
+        self.encrypt_tables = encrypt_tables
+        self.decrypt_tables = decrypt_tables
+
+    def encrypt(self, plaintext):
+        return _apply_periodic(plaintext, self.encrypt_tables)
+
+    def decrypt(self, ciphertext):
+        return _apply_periodic(ciphertext, self._decrypt_tables())
+
+    def encryptor(self):
+        return _PeriodicStream(self.encrypt_tables)
+
+    def decryptor(self):
+        return _PeriodicStream(self._decrypt_tables())
+
+    def _decrypt_tables(self):
+        if self.decrypt_tables is None:
+            raise ValueError("Key has no inverse modulo the alphabet size")
+        return self.decrypt_tables
+
+    def encrypt_bytes(self, data):
+        return self.byte_encryptor().update(data)
+
+    def decrypt_bytes(self, data):
+        return self.byte_decryptor().update(data)
+
+    def byte_encryptor(self):
+        return _PeriodicByteStream([byte_table(table) for table in self.encrypt_tables])
+
+    def byte_decryptor(self):
+        return _PeriodicByteStream([byte_table(table) for table in self._decrypt_tables()])
+
+class VigenereContext(_PeriodicContext):
+    __slots__ = ('key',)
+
+    def __init__(self, key, alphabet=UPPERCASE):
+        self.key = alphabet.clean_key(key)
+        if not self.key:
+            raise ValueError("Key must not be empty")
+        shifts = [alphabet.shift(char) for char in self.key]
+        self.encrypt_tables = [translation_table('additive', shift, 'encrypt', alphabet) for shift in shifts]
+        self.decrypt_tables = [translation_table('additive', shift, 'decrypt', alphabet) for shift in shifts]
+
+def _apply_periodic(text, tables, phase=0):
+    # Character i of text is translated with tables[(phase + i) % period]
+    period = len(tables)
+    if period == 1:
+        return text.translate(tables[0])
+    result = [''] * len(text)
+    for i in range(min(period, len(text))):
+        result[i::period] = text[i::period].translate(tables[(phase + i) % period])
+    return ''.join(result)
+
+def vigenere_encrypt(plaintext, key, alphabet=UPPERCASE):
+    return cipher_context(VigenereContext, key, alphabet).encrypt(plaintext)
+
+def vigenere_decrypt(ciphertext, key, alphabet=UPPERCASE):
+    return cipher_context(VigenereContext, key, alphabet).decrypt(ciphertext)
+
+# 7. Playfair Cipher
+def _playfair_table(key):
+    table = []
+    seen = set()
+    for char in key:
+        if char not in seen and char in LETTERS:
+            seen.add(char)
+            table.append(char)
+    for char in LETTERS:
+        if char not in seen and char != 'J':
+            seen.add(char)
+            table.append(char)
+    return table
+
+def _playfair_digraph(table, position, a, b, step):
+    # step is +1 to encrypt and -1 to decrypt
+    row_a, col_a = position[a]
+    row_b, col_b = position[b]
+    if row_a == row_b:  # Same row
+        return table[row_a * 5 + (col_a + step) % 5] + table[row_b * 5 + (col_b + step) % 5]
+    elif col_a == col_b:  # Same column
+        return table[((row_a + step) % 5) * 5 + col_a] + table[((row_b + step) % 5) * 5 + col_b]
+    else:  # Rectangle
+        return table[row_a * 5 + col_b] + table[row_b * 5 + col_a]
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def playfair_digraphs(square):
+    # Compile a square (its letters in row-major order) into a letter to
+    # (row, col) index and one digraph-to-digraph table per direction
+    table = list(square)
+    position = {char: divmod(i, 5) for i, char in enumerate(table)}
+    encrypt, decrypt = {}, {}
+    for a in table:
+        for b in table:
+            try:
+                encrypt[a + b] = _playfair_digraph(table, position, a, b, 1)
+                decrypt[a + b] = _playfair_digraph(table, position, a, b, -1)
+            except IndexError:  # Off the grid when the key's J makes a 26th cell
+                pass
+    return position, encrypt, decrypt
+
+# A plaintext bigram is two different letters; a doubled or trailing letter is paired with 'X'.
+# The pattern is compiled on first use, so importing this module does not load re
+_PLAYFAIR_BIGRAM = None
+
+def _playfair_bigrams(plaintext):
+    global _PLAYFAIR_BIGRAM
+    if _PLAYFAIR_BIGRAM is None:
+        import re
+        _PLAYFAIR_BIGRAM = re.compile(r'(.)((?!\1).)?', re.DOTALL)
+    return [a + (b or 'X') for a, b in _PLAYFAIR_BIGRAM.findall(plaintext)]
+
+def _playfair_lookup(digraphs, bigrams):
+    try:
+        return ''.join([digraphs[bigram] for bigram in bigrams])
+    except KeyError as e:
+        raise ValueError(f"{e.args[0]!r} is not a bigram of the Playfair square") from None
+
+class PlayfairContext(CipherContext):
+    __slots__ = ('square', 'position', 'encrypt_digraphs', 'decrypt_digraphs')
+
+    def __init__(self, key):
+        self.square = ''.join(_playfair_table(clean_text(key)))
+        self.position, self.encrypt_digraphs, self.decrypt_digraphs = playfair_digraphs(self.square)
+
+    def encrypt(self, plaintext):
+        plaintext = clean_text(plaintext).replace('J', 'I')
+        return _playfair_lookup(self.encrypt_digraphs, _playfair_bigrams(plaintext))
+
+    def decrypt(self, ciphertext):
+        bigrams = [ciphertext[i:i + 2] for i in range(0, len(ciphertext), 2)]
+        return _playfair_lookup(self.decrypt_digraphs, bigrams)
+
+def playfair_encrypt(plaintext, key):
+    return cipher_context(PlayfairContext, key).encrypt(plaintext)
+
+def playfair_decrypt(ciphertext, key):
+    return cipher_context(PlayfairContext, key).decrypt(ciphertext)
+
+# Transposition engine
+# A transposition is a list of runs (dst_start, dst_step, src_start, src_step,
+# count): output positions dst_start + k * dst_step take source characters
+# src_start + k * src_step. A src_start of None marks 'X' padding. Columnar
+# transpositions need only a handful of runs, so applying one is a few
+# strided slices, and chaining two composes into a single pass.
+PERMUTATION_CACHE_SIZE = 256
+
+def _intersect(start_a, step_a, count_a, start_b, step_b, count_b):
+    # Solve start_a + t * step_a == start_b + u * step_b for 0 <= t < count_a
+    # and 0 <= u < count_b; the solutions form a progression in both t and u
+    if start_b > start_a + step_a * (count_a - 1) or start_a > start_b + step_b * (count_b - 1):
+        return None
+    g = math.gcd(step_a, step_b)
+    diff = start_b - start_a
+    if diff % g:
+        return None
+    t_step, u_step = step_b // g, step_a // g
+    t = (diff // g) * pow(u_step, -1, t_step) % t_step
+    u = (start_a + t * step_a - start_b) // step_b
+    k_low = max(0, -(u // u_step))
+    k_high = min((count_a - 1 - t) // t_step, (count_b - 1 - u) // u_step)
+    if k_high < k_low:
+        return None
+    return t + k_low * t_step, u + k_low * u_step, t_step, u_step, k_high - k_low + 1
+
+class Permutation:
+    __slots__ = ('length', 'runs', 'starts', 'contiguous')
+
+    def __init__(self, length, runs):
+        self.length = length
+        self.runs = sorted(runs, key=lambda run: run[0])
+        self.starts = [run[0] for run in self.runs]
+        # Runs that tile the output left to right can be joined directly
+        position = 0
+        self.contiguous = True
+        for dst, dst_step, _, _, count in self.runs:
+            if dst != position or (dst_step != 1 and count > 1):
+                self.contiguous = False
+                break
+            position += count
+
+    def __call__(self, text):
+        if self.contiguous:
+            return ''.join([text[src:src + src_step * count:src_step] if src is not None else 'X' * count
+                            for _, _, src, src_step, count in self.runs])
+        result = [''] * self.length
+        for dst, dst_step, src, src_step, count in self.runs:
+            piece = text[src:src + src_step * count:src_step] if src is not None else 'X' * count
+            result[dst:dst + dst_step * count:dst_step] = piece
+        return ''.join(result)
+
+    def gather(self, data):
+        # __call__ for bytes-like data, into one preallocated bytearray
+        result = bytearray(self.length)
+        for dst, dst_step, src, src_step, count in self.runs:
+            piece = data[src:src + src_step * count:src_step] if src is not None else b'X' * count
+            result[dst:dst + dst_step * count:dst_step] = piece
+        return result
+
+    def source_index(self, position):
+        # Source index feeding output position, or None for padding. The run
+        # holding it starts at or before position: for contiguous runs it is
+        # the last such run, and interleaved runs (the bands of a keyed
+        # decryption) are found a few steps further back
+        runs = self.runs
+        for i in range(bisect_right(self.starts, position) - 1, -1, -1):
+            dst, dst_step, src, src_step, count = runs[i]
+            offset, rem = divmod(position - dst, dst_step)
+            if not rem and offset < count:
+                return None if src is None else src + offset * src_step
+        raise IndexError(position)
+
+    def indices(self):
+        # Source index for every output position (None for padding), for
+        # callers that gather with operator.itemgetter
+        result = [None] * self.length
+        for dst, dst_step, src, src_step, count in self.runs:
+            result[dst:dst + dst_step * count:dst_step] = (
+                range(src, src + src_step * count, src_step) if src is not None else [None] * count)
+        return result
+
+    def truncate(self, length):
+        # Keep only the first length output positions
+        runs = []
+        for dst, dst_step, src, src_step, count in self.runs:
+            count = min(count, -(-(length - dst) // dst_step))
+            if count > 0:
+                runs.append((dst, dst_step, src, src_step, count))
+        return Permutation(length, runs)
+
+    def then(self, other):
+        # The permutation equal to applying self, then other
+        runs = []
+        for dst, dst_step, mid, mid_step, count in other.runs:
+            if mid is None:
+                runs.append((dst, dst_step, None, 1, count))
+                continue
+            for inner_dst, inner_step, src, src_step, inner_count in self.runs:
+                hit = _intersect(mid, mid_step, count, inner_dst, inner_step, inner_count)
+                if hit is None:
+                    continue
+                t, u, t_step, u_step, hits = hit
+                if hits == 1:
+                    t_step = u_step = 1
+                runs.append((dst + t * dst_step, dst_step * t_step,
+                             None if src is None else src + u * src_step, src_step * u_step, hits))
+        return Permutation(other.length, runs)
+
+def _columns(start, step, stop):
+    # Run reading source[start:stop:step] into consecutive output positions
+    return start, step, len(range(start, stop, step))
+
+@lru_cache(maxsize=PERMUTATION_CACHE_SIZE)
+def keyless_permutation(length, direction):
+    if not length:
+        return Permutation(0, [])
+    if direction == 'encrypt':
+        cols = math.ceil(math.sqrt(length))  # Calculate number of columns
+        reads = [_columns(col, cols, length) for col in range(cols)]
+    else:
+        cols = math.ceil(math.sqrt(length))
+        rows = math.ceil(length / cols)
+        reads = [_columns(row, rows, length) for row in range(rows)]
+    runs, position = [], 0
+    for src, src_step, count in reads:
+        if count:
+            runs.append((position, 1, src, src_step, count))
+            position += count
+    return Permutation(length, runs)
+
+@lru_cache(maxsize=PERMUTATION_CACHE_SIZE)
+def keyed_permutation(key, length, direction):
+    # key must already be cleaned; encryption pads the grid with 'X'
+    cols = len(key)
+    rows = math.ceil(length / cols)
+    key_order = sorted(range(cols), key=lambda x: key[x])
+    runs = []
+    if direction == 'encrypt':
+        # Read the grid column by column based on key order
+        position = 0
+        for col in key_order:
+            src, src_step, count = _columns(col, cols, length)
+            if count:
+                runs.append((position, 1, src, src_step, count))
+            if rows > count:
+                runs.append((position + count, 1, None, 1, rows - count))
+            position += rows
+        return Permutation(rows * cols, runs)
+    # Columns are filled in key order, so only the last ones can come up
+    # short; each band of rows with the same filled columns reads row-major
+    rank = {col: i for i, col in enumerate(key_order)}
+    heights = [max(0, min(rows, length - rank[col] * rows)) for col in range(cols)]
+    bounds = sorted(set(heights) | {0})
+    base = 0
+    for low, high in zip(bounds, bounds[1:]):
+        filled = [col for col in range(cols) if heights[col] >= high]
+        for offset, col in enumerate(filled):
+            runs.append((base + offset, len(filled), rank[col] * rows + low, 1, high - low))
+        base += len(filled) * (high - low)
+    return Permutation(length, runs)
+
+# 8. Keyless Transposition Cipher
+def keyless_transposition_encrypt(plaintext):
+    plaintext = clean_text(plaintext)
+    return keyless_permutation(len(plaintext), 'encrypt')(plaintext)
+
+def keyless_transposition_decrypt(ciphertext):
+    ciphertext = clean_text(ciphertext)
+    return keyless_permutation(len(ciphertext), 'decrypt')(ciphertext)
+
+class KeylessTranspositionContext(CipherContext):
+    __slots__ = ()
+    steps = (None,)
+
+    def encrypt(self, plaintext):
+        return keyless_transposition_encrypt(plaintext)
+
+    def decrypt(self, ciphertext):
+        return keyless_transposition_decrypt(ciphertext)
+
+    def encrypt_bytes(self, data):
+        data = _clean_bytes(data)
+        return keyless_permutation(len(data), 'encrypt').gather(data)
+
+    def decrypt_bytes(self, data):
+        data = _clean_bytes(data)
+        return keyless_permutation(len(data), 'decrypt').gather(data)
+
+# 9. Keyed Transposition Cipher
+class KeyedTranspositionContext(CipherContext):
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = clean_text(key)
+        if not self.key:
+            raise ValueError("Key must not be empty")
+
+    @property
+    def steps(self):
+        return (self.key,)
+
+    def encrypt(self, plaintext):
+        plaintext = clean_text(plaintext)
+        return keyed_permutation(self.key, len(plaintext), 'encrypt')(plaintext)
+
+    def decrypt(self, ciphertext):
+        ciphertext = clean_text(ciphertext)
+        # Remove padding 'X'
+        return keyed_permutation(self.key, len(ciphertext), 'decrypt')(ciphertext).rstrip('X')
+
+    def encrypt_bytes(self, data):
+        data = _clean_bytes(data)
+        return keyed_permutation(self.key, len(data), 'encrypt').gather(data)
+
+    def decrypt_bytes(self, data):
+        data = _clean_bytes(data)
+        return keyed_permutation(self.key, len(data), 'decrypt').gather(data).rstrip(b'X')
+
+def keyed_transposition_encrypt(plaintext, key):
+    return cipher_context(KeyedTranspositionContext, key).encrypt(plaintext)
+
+def keyed_transposition_decrypt(ciphertext, key):
+    return cipher_context(KeyedTranspositionContext, key).decrypt(ciphertext)
+
+# 10. Double Transposition Cipher
+@lru_cache(maxsize=PERMUTATION_CACHE_SIZE)
+def double_transposition_permutation(key1, key2, length, direction, stripped=0):
+    # Both passes fused into one permutation. Decryption strips trailing 'X'
+    # between the passes, so the caller passes how many the first pass leaves
+    if direction == 'encrypt':
+        first = keyed_permutation(key1, length, 'encrypt')
+        return first.then(keyed_permutation(key2, first.length, 'encrypt'))
+    first = keyed_permutation(key2, length, 'decrypt').truncate(length - stripped)
+    return first.then(keyed_permutation(key1, first.length, 'decrypt'))
+
+class DoubleTranspositionContext(CipherContext):
+    __slots__ = ('key1', 'key2')
+
+    def __init__(self, key1, key2):
+        self.key1 = clean_text(key1)
+        self.key2 = clean_text(key2)
+        if not self.key1 or not self.key2:
+            raise ValueError("Key must not be empty")
+
+    @property
+    def steps(self):
+        return (self.key1, self.key2)
+
+    def encrypt(self, plaintext):
+        plaintext = clean_text(plaintext)
+        return double_transposition_permutation(self.key1, self.key2, len(plaintext), 'encrypt')(plaintext)
+
+    def decrypt(self, ciphertext):
+        ciphertext = clean_text(ciphertext)
+        return self._decryption(ciphertext, 'X')(ciphertext).rstrip('X')
+
+    def _decryption(self, ciphertext, pad):
+        length = len(ciphertext)
+        first = keyed_permutation(self.key2, length, 'decrypt')
+        # Count the padding 'X' the first decryption pass would strip
+        stripped = 0
+        while stripped < length and ciphertext[first.source_index(length - 1 - stripped)] == pad:
+            stripped += 1
+        return double_transposition_permutation(self.key1, self.key2, length, 'decrypt', stripped)
+
+    def encrypt_bytes(self, data):
+        data = _clean_bytes(data)
+        return double_transposition_permutation(self.key1, self.key2, len(data), 'encrypt').gather(data)
+
+    def decrypt_bytes(self, data):
+        data = _clean_bytes(data)
+        return self._decryption(data, ord('X')).gather(data).rstrip(b'X')
+
+def double_transposition_encrypt(plaintext, key1, key2):
+    return cipher_context(DoubleTranspositionContext, key1, key2).encrypt(plaintext)
+
+def double_transposition_decrypt(ciphertext, key1, key2):
+    return cipher_context(DoubleTranspositionContext, key1, key2).decrypt(ciphertext)
+# Streaming
+# Stream objects carry cipher state across chunk boundaries, so a file of any
+# size is processed with memory bounded by the chunk size. Streams whose state
+# depends only on the character count also have seek(position).
+CHUNK_SIZE = 1 << 16
+
+# Maps letter indices 0-25 to b'A'-b'Z'
+_INDEX_TO_LETTER = bytes(65 + i % 26 for i in range(256))
+
+class _TableStream:
+    __slots__ = ('table',)
+
+    def __init__(self, table):
+        self.table = table
+
+    def update(self, text):
+        return text.translate(self.table)
+
+    def seek(self, position):
+        pass
+
+class _PeriodicStream:
+    # The key position advances on every character, uppercase or not
+    __slots__ = ('tables', 'phase')
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.phase = 0
+
+    def update(self, text):
+        result = _apply_periodic(text, self.tables, self.phase)
+        self.phase = (self.phase + len(text)) % len(self.tables)
+        return result
+
+    def seek(self, position):
+        # Continue as if position characters had already been processed
+        self.phase = position % len(self.tables)
+
+class _AutokeyEncryptStream:
+    # running holds the next len(key) characters of the running key
+    __slots__ = ('running',)
+
+    def __init__(self, key):
+        self.running = key
+
+    def update(self, plaintext):
+        extended_key = self.running + plaintext
+        self.running = extended_key[len(plaintext):]
+        return ''.join([chr((ord(char) + ord(k) - 130) % 26 + 65) for char, k in zip(plaintext, extended_key)])
+
+class _AutokeyDecryptStream:
+    # Ring buffer of the last len(key) key values: the slot used to decrypt
+    # position i is refilled with plaintext i, which is the key for i + len(key)
+    __slots__ = ('ring', 'position')
+
+    def __init__(self, key):
+        self.ring = [ord(char) - 65 for char in key]
+        self.position = 0
+
+    def update(self, ciphertext):
+        ring = self.ring
+        size = len(ring)
+        if ciphertext and not size:
+            raise ValueError("Key must not be empty")
+        position = self.position
+        decrypted = bytearray(len(ciphertext))
+        for i, char in enumerate(ciphertext):
+            value = (ord(char) - 65 - ring[position]) % 26
+            ring[position] = value
+            decrypted[i] = value
+            position += 1
+            if position == size:
+                position = 0
+        self.position = position
+        return decrypted.translate(_INDEX_TO_LETTER).decode('ascii')
+
+class _AlphabetAutokeyStream:
+    # Autokey over an alphabet other than A-Z. Characters outside the
+    # alphabet pass through and do not advance the running key. The ring
+    # holds the last len(key) plaintext indices, as in _AutokeyDecryptStream;
+    # sign is 1 to encrypt and -1 to decrypt.
+    __slots__ = ('ring', 'position', 'alphabet', 'sign')
+
+    def __init__(self, key, alphabet, sign):
+        self.ring = [alphabet.shift(char) for char in key]
+        self.position = 0
+        self.alphabet = alphabet
+        self.sign = sign
+
+    def update(self, text):
+        ring, position, sign = self.ring, self.position, self.sign
+        size = len(ring)
+        index, letters, n = self.alphabet.index, self.alphabet.letters, self.alphabet.size
+        result = []
+        append = result.append
+        for char in text:
+            i = index.get(char)
+            if i is None:
+                append(char)
+                continue
+            if not size:
+                raise ValueError("Key must not be empty")
+            value = (i + sign * ring[position]) % n
+            ring[position] = i if sign > 0 else value
+            append(letters[value])
+            position += 1
+            if position == size:
+                position = 0
+        self.position = position
+        return ''.join(result)
+
+# Bytes path
+# The same ciphers over bytes, bytearray, memoryview and mmap objects with no
+# str in between. Only ASCII is changed: the A-Z fast path maps ASCII A-Z and
+# leaves every other byte alone (UTF-8 encoded non-ASCII letters included),
+# and custom alphabets must be ASCII. Byte streams write into a caller's
+# buffer with update_into(data, out, offset).
+_UPPERCASE_BYTES = bytes.maketrans(LETTERS.lower().encode(), LETTERS.encode())
+_BYTE_TABLES = {}
+
+def byte_table(table):
+    # bytes.translate table for a str.translate table, cached per table
+    entry = _BYTE_TABLES.get(id(table))
+    if entry is not None and entry[0] is table:
+        return entry[1]
+    values = [table.get(code, code) if code < 128 else code for code in range(256)]
+    if max(values) > 255 or any(value >= 128 for value in values[:128]):
+        raise ValueError("The bytes path needs an ASCII alphabet")
+    if len(_BYTE_TABLES) >= 4 * TABLE_CACHE_SIZE:
+        _BYTE_TABLES.clear()
+    result = bytes(values)
+    _BYTE_TABLES[id(table)] = (table, result)
+    return result
+
+def _as_bytes(data):
+    # bytes and bytearray have translate(); memoryview and mmap are copied
+    return data if isinstance(data, (bytes, bytearray)) else bytes(data)
+
+def _clean_bytes(data):
+    # clean_text for bytes: spaces dropped and ASCII uppercased in one pass
+    return _as_bytes(data).translate(_UPPERCASE_BYTES, b' ')
+
+class _ByteStream:
+    __slots__ = ()
+
+    def update(self, data):
+        result = bytearray(len(data))
+        self.update_into(data, result, 0)
+        return result
+
+class _ByteTableStream(_ByteStream):
+    __slots__ = ('table',)
+
+    def __init__(self, table):
+        self.table = table
+
+    def update_into(self, data, out, offset):
+        out[offset:offset + len(data)] = _as_bytes(data).translate(self.table)
+
+    def seek(self, position):
+        pass
+
+class _PeriodicByteStream(_ByteStream):
+    # Each key position's bytes are translated as one strided slice and
+    # written straight into the output buffer
+    __slots__ = ('tables', 'phase')
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.phase = 0
+
+    def update_into(self, data, out, offset):
+        data = _as_bytes(data)
+        tables, phase = self.tables, self.phase
+        period, end = len(tables), offset + len(data)
+        for i in range(min(period, len(data))):
+            out[offset + i:end:period] = data[i::period].translate(tables[(phase + i) % period])
+        self.phase = (phase + len(data)) % period
+
+    def seek(self, position):
+        self.phase = position % len(self.tables)
+
+class _AutokeyByteStream(_ByteStream):
+    # Ring buffer of the last len(key) plaintext values, as in
+    # _AutokeyDecryptStream; sign is 1 to encrypt and -1 to decrypt. On A-Z
+    # every byte is transformed, as the str ciphers transform every
+    # character; other alphabets skip bytes outside the alphabet.
+    __slots__ = ('ring', 'position', 'index', 'letters', 'size', 'sign')
+
+    def __init__(self, key, alphabet, sign):
+        self.ring = [alphabet.shift(char) for char in key]
+        self.position = 0
+        if alphabet.is_uppercase:
+            self.index = [(code - 65) % 26 for code in range(256)]
+        else:
+            if any(ord(char) > 127 for char in alphabet.letters):
+                raise ValueError("The bytes path needs an ASCII alphabet")
+            self.index = [alphabet.index.get(chr(code), -1) for code in range(256)]
+        self.letters = alphabet.letters.encode('ascii')
+        self.size = alphabet.size
+        self.sign = sign
+
+    def update_into(self, data, out, offset):
+        ring, position, index, letters, n, sign = (self.ring, self.position, self.index, self.letters,
+                                                   self.size, self.sign)
+        period = len(ring)
+        result = bytearray(_as_bytes(data))
+        for i, code in enumerate(result):
+            value = index[code]
+            if value < 0:
+                continue
+            if not period:
+                raise ValueError("Key must not be empty")
+            shifted = (value + sign * ring[position]) % n
+            ring[position] = value if sign > 0 else shifted
+            result[i] = letters[shifted]
+            position += 1
+            if position == period:
+                position = 0
+        self.position = position
+        out[offset:offset + len(result)] = result
+
+def stream_file(stream, source, destination, chunk_size=CHUNK_SIZE):
+    # Feed source through stream.update and write each result immediately
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        destination.write(stream.update(chunk))
+
+def open_text(path, mode='r'):
+    # '-' means stdin/stdout; undecodable bytes round-trip unchanged
+    if path == '-':
+        path = sys.stdin.fileno() if 'r' in mode else sys.stdout.fileno()
+        return open(path, mode, encoding='utf-8', errors='surrogateescape', newline='', closefd=False)
+    return open(path, mode, encoding='utf-8', errors='surrogateescape', newline='')
+
+
+# Cipher dispatch
+# Shared by the interactive menu and the command line, which find each cipher
+# in registry.CIPHERS. Ciphers that stream are processed chunk by chunk, the
+# rest are applied to the whole text at once. Ciphers that take alphabets get
+# an Alphabet after their key values.
+def parse_key(name, values, alphabet=None):
+    # Key values as typed to the key list the cipher's functions take, with
+    # the alphabet appended when one is given
+    cipher = CIPHERS[name]
+    params = cipher.params
+    if len(values) != len(params):
+        raise ValueError(f"{name} takes {len(params)} key value(s)")
+    converts = [param.convert for param in params]
+    if alphabet is not None:
+        if not cipher.alphabets:
+            raise ValueError(f"{name} does not take an alphabet")
+        # Keys for other alphabets are taken as typed
+        if not alphabet.is_uppercase:
+            converts = [int if convert is int else str for convert in converts]
+    try:
+        key = [convert(value) for convert, value in zip(converts, values)]
+    except TypeError:
+        raise ValueError(f"wrong key type for {name}") from None
+    if alphabet is not None:
+        cipher_context(cipher.context, *key, alphabet)  # Reject bad keys up front
+        key.append(alphabet)
+    return key
+
+def can_stream(name):
+    return CIPHERS[name].streams
+
+def transform_text(name, command, text, key):
+    cipher = CIPHERS[name]
+    function = cipher.encrypt if command == 'encrypt' else cipher.decrypt
+    return function(text, *key)
+
+def make_stream(name, command, key):
+    context = cipher_context(CIPHERS[name].context, *key)
+    return context.encryptor() if command == 'encrypt' else context.decryptor()
+
+def transform_bytes(name, command, key, data):
+    context = cipher_context(CIPHERS[name].context, *key)
+    return context.encrypt_bytes(data) if command == 'encrypt' else context.decrypt_bytes(data)
+
+def make_byte_stream(name, command, key):
+    context = cipher_context(CIPHERS[name].context, *key)
+    return context.byte_encryptor() if command == 'encrypt' else context.byte_decryptor()
+
+def _open_binary(path, mode):
+    if path == '-':
+        return open((sys.stdin if 'r' in mode else sys.stdout).fileno(), mode, closefd=False)
+    return open(path, mode)
+
+def _drops_final_newline(name, command):
+    # Whole-text ciphers move every character, so the newline a plaintext
+    # file ends with would land inside the ciphertext (and Playfair rejects
+    # it); encrypt drops it as run_search does. Transposition ciphertext can
+    # end in a newline of its own and is decrypted as it is; Playfair
+    # ciphertext is letters only, so a final newline there is the file's.
+    return command == 'encrypt' or name == 'playfair'
+
+def transform_mapped(name, command, key, source, destination, chunk_size=CHUNK_SIZE):
+    # Bytes path for files. Sources are memory-mapped; ciphers with a byte
+    # stream translate chunk_size slices straight into a memory-mapped
+    # destination of the same size, the rest transform the mapped source in
+    # one go.
+    import mmap
+    import stat
+    streaming = can_stream(name)
+    with _open_binary(source, 'rb') as src:
+        status = os.fstat(src.fileno())
+        if stat.S_ISREG(status.st_mode) and status.st_size:
+            data = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            data = src.read()  # pipes and terminals cannot be mapped, and report no size
+        size = len(data)
+        try:
+            if streaming and destination != '-' and size:
+                stream = make_byte_stream(name, command, key)
+                with open(destination, 'w+b') as dst:
+                    dst.truncate(size)
+                    with mmap.mmap(dst.fileno(), size) as out:
+                        for offset in range(0, size, chunk_size):
+                            stream.update_into(data[offset:offset + chunk_size], out, offset)
+                return
+            with _open_binary(destination, 'wb') as dst:
+                if streaming:
+                    stream = make_byte_stream(name, command, key)
+                    for offset in range(0, size, chunk_size):
+                        dst.write(stream.update(data[offset:offset + chunk_size]))
+                else:
+                    data = data[:]
+                    if _drops_final_newline(name, command):
+                        data = data.rstrip(b'\r\n')
+                    dst.write(transform_bytes(name, command, key, data))
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+def transform_file(name, command, key, source, destination, chunk_size=CHUNK_SIZE, jobs=1, binary=False):
+    # Stream when the cipher allows it, otherwise transform the whole file.
+    # Large files of seekable ciphers are split across jobs processes.
+    if binary:
+        transform_mapped(name, command, key, source, destination, chunk_size)
+        return
+    if can_stream(name):
+        stream = make_stream(name, command, key)
+        if (jobs > 1 and CIPHERS[name].seekable and source != '-'
+                and os.path.getsize(source) > PARALLEL_CHUNK_SIZE):
+            parallel_transform_file(name, command, key, source, destination, jobs)
+            return
+    with open_text(source, 'r') as src, open_text(destination, 'w') as dst:
+        if can_stream(name):
+            stream_file(stream, src, dst, chunk_size)
+        else:
+            text = src.read()
+            if _drops_final_newline(name, command):
+                text = text.rstrip('\r\n')
+            dst.write(transform_text(name, command, text, key))
+
+# Pipelines
+# A pipeline runs cipher stages one after another and fuses neighbours that
+# compose: table ciphers and Vigenère become one periodic context whose
+# period is the lcm of theirs (table ciphers have period 1), and
+# transpositions become one permutation applied to the text once. Fusion
+# never reorders stages. What is left runs stage by stage, chunk by chunk
+# when every stage can stream.
+FUSED_PERIOD_LIMIT = 1024
+
+class _ComposedTable(dict):
+    # str.translate table for translating with first, then second
+    __slots__ = ('first', 'second')
+
+    def __init__(self, first, second):
+        super().__init__()
+        self.first = first
+        self.second = second
+        for code in range(256):
+            self[code] = self._lookup(code)
+
+    def _lookup(self, code):
+        try:
+            code = self.first[code]
+        except LookupError:
+            pass
+        try:
+            return self.second[code]
+        except LookupError:
+            return code
+
+    def __missing__(self, code):
+        value = self[code] = self._lookup(code)
+        return value
+
+def compose_tables(first, second):
+    if isinstance(first, _TranslationTable) and isinstance(second, _TranslationTable):
+        return _TranslationTable([second.mapping[i] for i in first.mapping])
+    return _ComposedTable(first, second)
+
+def _periodic_tables(context):
+    if isinstance(context, _TableContext):
+        decrypt = None if context.decrypt_table is None else [context.decrypt_table]
+        return [context.encrypt_table], decrypt
+    if isinstance(context, _PeriodicContext):
+        return context.encrypt_tables, context.decrypt_tables
+    return None
+
+class _TranspositionChain(CipherContext):
+    # steps is a key per transposition in encryption order, None for keyless
+    __slots__ = ('steps',)
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def encryption(self, length):
+        permutation = None
+        for key in self.steps:
+            length = permutation.length if permutation else length
+            step = keyless_permutation(length, 'encrypt') if key is None else keyed_permutation(key, length, 'encrypt')
+            permutation = step if permutation is None else permutation.then(step)
+        return permutation
+
+    def decryption(self, ciphertext, pad):
+        # Keyed steps strip trailing padding before the next step, so each
+        # count is read off the ciphertext through the steps so far
+        permutation = None
+        for key in reversed(self.steps):
+            length = permutation.length if permutation else len(ciphertext)
+            step = keyless_permutation(length, 'decrypt') if key is None else keyed_permutation(key, length, 'decrypt')
+            permutation = step if permutation is None else permutation.then(step)
+            if key is not None:
+                kept = permutation.length
+                while kept and ciphertext[permutation.source_index(kept - 1)] == pad:
+                    kept -= 1
+                permutation = permutation.truncate(kept)
+        return permutation
+
+    def encrypt(self, plaintext):
+        plaintext = clean_text(plaintext)
+        return self.encryption(len(plaintext))(plaintext)
+
+    def decrypt(self, ciphertext):
+        ciphertext = clean_text(ciphertext)
+        return self.decryption(ciphertext, 'X')(ciphertext)
+
+    def encrypt_bytes(self, data):
+        data = _clean_bytes(data)
+        return self.encryption(len(data)).gather(data)
+
+    def decrypt_bytes(self, data):
+        data = _clean_bytes(data)
+        return self.decryption(data, ord('X')).gather(data)
+
+def _fuse(first, second):
+    # One context equal to first then second, or None
+    tables = _periodic_tables(first), _periodic_tables(second)
+    if None not in tables:
+        (encrypt1, decrypt1), (encrypt2, decrypt2) = tables
+        period = math.lcm(len(encrypt1), len(encrypt2))
+        if period > FUSED_PERIOD_LIMIT:
+            return None
+        encrypt = [compose_tables(encrypt1[i % len(encrypt1)], encrypt2[i % len(encrypt2)]) for i in range(period)]
+        decrypt = None
+        if decrypt1 is not None and decrypt2 is not None:
+            decrypt = [compose_tables(decrypt2[i % len(decrypt2)], decrypt1[i % len(decrypt1)]) for i in range(period)]
+        return _PeriodicContext(encrypt, decrypt)
+    if hasattr(first, 'steps') and hasattr(second, 'steps'):
+        return _TranspositionChain(tuple(first.steps) + tuple(second.steps))
+    return None
+
+class _ChainStream:
+    __slots__ = ('streams',)
+
+    def __init__(self, streams):
+        self.streams = streams
+
+    def update(self, text):
+        for stream in self.streams:
+            text = stream.update(text)
+        return text
+
+class _ByteChainStream(_ByteStream):
+    __slots__ = ('streams',)
+
+    def __init__(self, streams):
+        self.streams = streams
+
+    def update_into(self, data, out, offset):
+        end = offset + len(data)
+        self.streams[0].update_into(data, out, offset)
+        for stream in self.streams[1:]:
+            stream.update_into(out[offset:end], out, offset)
+
+class Pipeline(CipherContext):
+    # stages are contexts in encryption order; decryption runs them backwards
+    __slots__ = ('stages',)
+
+    def __init__(self, stages):
+        fused = []
+        for context in stages:
+            merged = _fuse(fused[-1], context) if fused else None
+            if merged is None:
+                fused.append(context)
+            else:
+                fused[-1] = merged
+        if not fused:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = fused
+
+    @property
+    def can_stream(self):
+        return all(hasattr(stage, 'encryptor') for stage in self.stages)
+
+    def encrypt(self, plaintext):
+        for stage in self.stages:
+            plaintext = stage.encrypt(plaintext)
+        return plaintext
+
+    def decrypt(self, ciphertext):
+        for stage in reversed(self.stages):
+            ciphertext = stage.decrypt(ciphertext)
+        return ciphertext
+
+    def encrypt_bytes(self, data):
+        for stage in self.stages:
+            data = stage.encrypt_bytes(data)
+        return data
+
+    def decrypt_bytes(self, data):
+        for stage in reversed(self.stages):
+            data = stage.decrypt_bytes(data)
+        return data
+
+    def encryptor(self):
+        self._check_streaming()
+        return _ChainStream([stage.encryptor() for stage in self.stages])
+
+    def decryptor(self):
+        self._check_streaming()
+        return _ChainStream([stage.decryptor() for stage in reversed(self.stages)])
+
+    def byte_encryptor(self):
+        self._check_streaming()
+        return _ByteChainStream([stage.byte_encryptor() for stage in self.stages])
+
+    def byte_decryptor(self):
+        self._check_streaming()
+        return _ByteChainStream([stage.byte_decryptor() for stage in reversed(self.stages)])
+
+    def _check_streaming(self):
+        if not self.can_stream:
+            raise ValueError("Only pipelines of substitution and Vigenère-family stages can stream")
+
+def pipeline(*stages):
+    # pipeline(('affine', 5, 8), ('vigenere', 'LEMON'), ('keyed_transposition', 'ZEBRA'))
+    return Pipeline([cipher_context(CIPHERS[name].context, *key) for name, *key in stages])
+
+
+# Parallel chunks
+# Additive, affine, monoalphabetic and Vigenère output at any point depends
+# only on how many characters precede it, so one large file can be cut into
+# chunks that worker processes transform independently. The parent counts
+# characters per chunk to give each worker its starting position, and writes
+# the results back in order.
+PARALLEL_CHUNK_SIZE = 1 << 22
+
+def _utf8_boundary(data):
+    # Length of the longest prefix of data that does not end inside a UTF-8 sequence
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte < 0x80:
+            return len(data)
+        if byte >= 0xC0:
+            needed = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            return len(data) if back >= needed else len(data) - back
+    return len(data)
+
+def _split_file(path, chunk_size):
+    # Yield (offset, size, characters) for chunks cut on character boundaries
+    with open(path, 'rb') as f:
+        offset = 0
+        carry = b''
+        while True:
+            block = f.read(chunk_size)
+            data = carry + block
+            if not data:
+                break
+            cut = _utf8_boundary(data) if block else len(data)
+            if not cut:
+                carry = data
+                continue
+            chunk, carry = data[:cut], data[cut:]
+            characters = len(chunk) if chunk.isascii() else len(chunk.decode('utf-8', 'surrogateescape'))
+            yield offset, cut, characters
+            offset += cut
+
+def _transform_chunk(name, command, key, path, offset, size, position):
+    stream = make_stream(name, command, key)
+    stream.seek(position)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(size)
+    text = data.decode('utf-8', 'surrogateescape')
+    return stream.update(text).encode('utf-8', 'surrogateescape')
+
+def parallel_transform_file(name, command, key, source, destination, jobs, chunk_size=PARALLEL_CHUNK_SIZE):
+    # Output is byte-identical to transform_file with jobs=1
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    if not CIPHERS[name].seekable:
+        raise ValueError(f"{name} cannot be split into independent chunks")
+    if destination == '-':
+        dst = open(sys.stdout.fileno(), 'wb', closefd=False)
+    else:
+        dst = open(destination, 'wb')
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=jobs) as pool, dst:
+        position = 0
+        for offset, size, characters in _split_file(source, chunk_size):
+            if len(pending) >= 2 * jobs:
+                dst.write(pending.popleft().result())
+            pending.append(pool.submit(_transform_chunk, name, command, key, source, offset, size, position))
+            position += characters
+        while pending:
+            dst.write(pending.popleft().result())
+
+
+# Random access
+# decrypt_range decrypts bytes start..end of a file and reads little more
+# than those bytes. Additive, multiplicative, affine and monoalphabetic
+# decrypt the slice as it is. Vigenère also needs the key position, that is
+# the number of characters before start; a sidecar index holds the character
+# count every INDEX_STEP bytes, so only the bytes since the last checkpoint
+# are decoded. The index is built by one pass over the file the first time it
+# is needed and rebuilt when the file changes. For the transpositions start
+# and end are positions in the plaintext, and each one is mapped back
+# through the permutation to the ciphertext byte it came from. Text-mode
+# encrypt permutes characters, so this needs a ciphertext with one byte per
+# character; the character index tells, and other files are rejected. With
+# binary=True offsets are plain byte offsets and the result is bytes, as
+# encrypt --bytes permutes bytes.
+INDEX_STEP = 1 << 20
+_INDEX_MAGIC = b'CIDX'
+
+def character_index(path):
+    # (offsets, characters): characters[i] characters precede byte offsets[i]
+    from array import array
+    stat = os.stat(path)
+    stamp = [stat.st_size, stat.st_mtime_ns, INDEX_STEP]
+    sidecar = path + '.index'
+    try:
+        with open(sidecar, 'rb') as f:
+            data = f.read()
+        values = array('q', data[len(_INDEX_MAGIC):])
+        if data[:len(_INDEX_MAGIC)] == _INDEX_MAGIC and values[:3].tolist() == stamp and len(values) % 2:
+            count = (len(values) - 3) // 2
+            return values[3:3 + count], values[3 + count:]
+    except (OSError, ValueError):
+        pass
+    offsets, characters = array('q', [0]), array('q', [0])
+    for offset, size, count in _split_file(path, INDEX_STEP):
+        offsets.append(offset + size)
+        characters.append(characters[-1] + count)
+    try:
+        with open(sidecar, 'wb') as f:
+            f.write(_INDEX_MAGIC)
+            f.write(array('q', stamp).tobytes() + offsets.tobytes() + characters.tobytes())
+    except OSError:
+        pass
+    return offsets, characters
+
+def _characters_before(f, path, offset):
+    offsets, characters = character_index(path)
+    checkpoint = bisect_right(offsets, offset) - 1
+    f.seek(offsets[checkpoint])
+    data = f.read(offset - offsets[checkpoint])
+    return characters[checkpoint] + len(data.decode('utf-8', 'surrogateescape'))
+
+def _character_bounds(f, start, end):
+    # Widen start..end so that no UTF-8 sequence is cut at either end
+    f.seek(max(0, start - 3))
+    before = f.read(start - max(0, start - 3))
+    f.seek(end)
+    after = f.read(3)
+    back = 0
+    while back < len(before) and 0x80 <= before[-1 - back] < 0xC0:
+        back += 1
+    if back < len(before) and before[-1 - back] >= 0xC0:
+        start -= back + 1
+    ahead = 0
+    while ahead < len(after) and 0x80 <= after[ahead] < 0xC0:
+        ahead += 1
+    return start, end + ahead
+
+def decrypt_range(name, key, path, start, end, binary=False):
+    context_class = CIPHERS[name].context
+    if context_class in (KeylessTranspositionContext, KeyedTranspositionContext, DoubleTranspositionContext):
+        return _transposition_range(name, key, path, start, end, binary)
+    if not CIPHERS[name].seekable:
+        raise ValueError(f"{name} cannot be decrypted from an offset")
+    size = os.path.getsize(path)
+    start, end = min(max(start, 0), size), min(max(end, start), size)
+    with open(path, 'rb') as f:
+        if binary:
+            stream = make_byte_stream(name, 'decrypt', key)
+            stream.seek(start)
+            f.seek(start)
+            return bytes(stream.update(f.read(end - start)))
+        start, end = _character_bounds(f, start, end)
+        stream = make_stream(name, 'decrypt', key)
+        if context_class is VigenereContext:
+            stream.seek(_characters_before(f, path, start))
+        f.seek(start)
+        return stream.update(f.read(end - start).decode('utf-8', 'surrogateescape'))
+
+def _transposition_range(name, key, path, start, end, binary):
+    import mmap
+    context = cipher_context(CIPHERS[name].context, *key)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return b'' if binary else ''
+        if not binary and character_index(path)[1][-1] != size:
+            raise ValueError("Range decryption of a transposition needs an ASCII ciphertext; "
+                             "decrypt the whole file instead")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if isinstance(context, KeylessTranspositionContext):
+                permutation, padded = keyless_permutation(size, 'decrypt'), False
+            elif isinstance(context, KeyedTranspositionContext):
+                permutation, padded = keyed_permutation(context.key, size, 'decrypt'), True
+            else:
+                permutation, padded = context._decryption(data, ord('X')), True
+            source = permutation.source_index
+            length = permutation.length
+            # decrypt strips the trailing 'X' of the plaintext
+            while padded and length and data[source(length - 1)] in b'Xx':
+                length -= 1
+            start, end = min(max(start, 0), length), min(max(end, start), length)
+            result = bytes(data[source(position)] for position in range(start, end)).translate(_UPPERCASE_BYTES)
+    if binary:
+        return result
+    if not result.isascii():
+        raise ValueError("Range decryption of a transposition needs an ASCII ciphertext")
+    return result.decode('ascii')
+
+# Profiling
+# start_profiling() wraps the cipher engines so that every call is counted
+# and timed, and nothing is wrapped until then, so a run without it pays
+# nothing. Calls are grouped by kind:
+#   setup      context construction and the cached key-schedule builders
+#   transform  context encrypt/decrypt, str and bytes, per cipher
+#   stream     stream updates per stream class (chunks of a streamed file)
+#   io         file-level entry points, which include the transforms above
+# Each label keeps a call count, total and longest time, a histogram of
+# call times in power-of-two nanosecond buckets, and the size of what went in
+# and came out (characters for str, bytes for bytes). Nested calls are
+# counted at every level. The report adds the hit rates of the lru caches.
+# Set CIPHER_PROFILE=1 (report on stderr at exit) or CIPHER_PROFILE=FILE
+# (JSON report), or pass --profile / --profile-out FILE on the command line.
+# Only this process is measured, not worker processes.
+PROFILE_ENV = 'CIPHER_PROFILE'
+_PROFILER = None
+
+class _Timing:
+    __slots__ = ('calls', 'total', 'longest', 'histogram', 'size_in', 'size_out')
+
+    def __init__(self):
+        self.calls = self.total = self.longest = self.size_in = self.size_out = 0
+        self.histogram = [0] * 64
+
+    def add(self, elapsed, size_in=0, size_out=0):
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.longest:
+            self.longest = elapsed
+        self.histogram[elapsed.bit_length()] += 1
+        self.size_in += size_in
+        self.size_out += size_out
+
+    def report(self):
+        buckets = {f"<{1 << bits}ns": count for bits, count in enumerate(self.histogram) if count}
+        return {'calls': self.calls, 'total_ns': self.total, 'longest_ns': self.longest,
+                'in': self.size_in, 'out': self.size_out, 'histogram': buckets}
+
+def _sizes(args, result):
+    # (in, out) for calls whose first argument after self is the data
+    size_in = len(args[1]) if len(args) > 1 and hasattr(args[1], '__len__') else 0
+    return size_in, len(result) if hasattr(result, '__len__') else size_in
+
+class Profiler:
+    __slots__ = ('timings', 'originals')
+
+    def __init__(self):
+        self.timings = {}
+        self.originals = []
+
+    def wrap(self, owner, name, kind, label, sized=False):
+        original = getattr(owner, name) if not isinstance(owner, dict) else owner[name]
+        timing = self.timings.setdefault((kind, label), _Timing())
+        clock = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                result = original(*args, **kwargs)
+            except BaseException:
+                timing.add(clock() - start, *_sizes(args, ()) if sized else ())
+                raise
+            timing.add(clock() - start, *_sizes(args, result) if sized else ())
+            return result
+
+        timed.__wrapped__ = original
+        for attribute in ('cache_info', 'cache_clear'):
+            if hasattr(original, attribute):
+                setattr(timed, attribute, getattr(original, attribute))
+        if isinstance(owner, dict):
+            self.originals.append((owner, name, owner[name]))
+            owner[name] = timed
+        else:
+            self.originals.append((owner, name, vars(owner).get(name)))
+            setattr(owner, name, timed)
+
+    def install(self):
+        module = globals()
+        # Cipher contexts come first: each gets its own wrappers, so wrapping
+        # the shared bases afterwards cannot count a call twice
+        contexts = [(name, cipher.context) for name, cipher in CIPHERS.items()]
+        contexts += [('pipeline', Pipeline), ('fused periodic', _PeriodicContext),
+                     ('fused transposition', _TranspositionChain)]
+        for name, context in contexts:
+            self.wrap(context, '__init__', 'setup', name)
+            for method in ('encrypt', 'decrypt', 'encrypt_bytes', 'decrypt_bytes'):
+                if hasattr(context, method):
+                    self.wrap(context, method, 'transform', f"{name} {method}", sized=True)
+        for name in ('translation_table', 'playfair_digraphs', 'keyless_permutation', 'keyed_permutation',
+                     'double_transposition_permutation', 'byte_table', 'character_index'):
+            self.wrap(module, name, 'setup', name)
+        for name, value in list(module.items()):
+            if isinstance(value, type) and value.__module__ == __name__:
+                if 'update_into' in vars(value):
+                    self.wrap(value, 'update_into', 'stream', name, sized=True)
+                elif 'update' in vars(value) and not issubclass(value, _ByteStream):
+                    self.wrap(value, 'update', 'stream', name, sized=True)
+        for name in ('transform_file', 'stream_file', 'transform_mapped', 'parallel_transform_file', 'decrypt_range'):
+            self.wrap(module, name, 'io', name)
+
+    def uninstall(self):
+        for owner, name, original in reversed(self.originals):
+            if isinstance(owner, dict):
+                owner[name] = original
+            elif original is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+        self.originals = []
+
+    def report(self):
+        result = {}
+        for (kind, label), timing in sorted(self.timings.items()):
+            if timing.calls:
+                result.setdefault(kind, {})[label] = timing.report()
+        caches = {}
+        for name, value in globals().items():
+            info = getattr(value, 'cache_info', None)
+            if info is not None and callable(info):
+                info = info()
+                lookups = info.hits + info.misses
+                if lookups:
+                    caches[name] = {'hits': info.hits, 'misses': info.misses,
+                                    'hit_rate': round(info.hits / lookups, 4), 'size': info.currsize}
+        result['caches'] = caches
+        return result
+
+    def print_report(self, file=None):
+        file = file or sys.stderr
+        report = self.report()
+        print(f"{'kind':<10} {'label':<40} {'calls':>8} {'total ms':>10} {'mean us':>10} {'max us':>10} "
+              f"{'in':>12} {'out':>12}", file=file)
+        for kind in ('setup', 'transform', 'stream', 'io'):
+            for label, row in report.get(kind, {}).items():
+                print(f"{kind:<10} {label:<40} {row['calls']:>8} {row['total_ns'] / 1e6:>10.2f} "
+                      f"{row['total_ns'] / row['calls'] / 1e3:>10.1f} {row['longest_ns'] / 1e3:>10.1f} "
+                      f"{row['in']:>12} {row['out']:>12}", file=file)
+        for name, row in report['caches'].items():
+            print(f"cache      {name:<40} {row['hits']:>8} hits {row['misses']:>8} misses "
+                  f"{row['hit_rate']:>7.1%}", file=file)
+
+    def dump(self, destination):
+        # '-' (or '1') prints a table to stderr; anything else is a JSON file
+        if destination in ('-', '1'):
+            self.print_report()
+        else:
+            import json
+            with open(destination, 'w') as f:
+                json.dump(self.report(), f, indent=1)
+
+def start_profiling(destination=None):
+    # Returns the active Profiler; with a destination its report is written at exit
+    global _PROFILER
+    if _PROFILER is None:
+        _PROFILER = Profiler()
+        _PROFILER.install()
+        if destination:
+            import atexit
+            atexit.register(_PROFILER.dump, destination)
+    return _PROFILER
+
+def stop_profiling():
+    global _PROFILER
+    profiler, _PROFILER = _PROFILER, None
+    if profiler is not None:
+        profiler.uninstall()
+    return profiler
+
+if os.environ.get(PROFILE_ENV):
+    start_profiling(os.environ[PROFILE_ENV])
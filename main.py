@@ -1,397 +1,26 @@
-import random
-import string
-
-# Helper functions
-def mod_inverse(a, m):
-    for x in range(1, m):
-        if (a * x) % m == 1:
-            return x
-    return None
-
-def clean_text(text):
-    return ''.join([char.upper() for char in text if char.isalpha()])
-
-# Ciphers Implementation
-
-# 1. Additive Cipher
-def additive_encrypt(plaintext, key):
-    return ''.join([chr((ord(char) - 65 + key) % 26 + 65) if char.isupper() else char for char in plaintext])
-
-def additive_decrypt(ciphertext, key):
-    return ''.join([chr((ord(char) - 65 - key) % 26 + 65) if char.isupper() else char for char in ciphertext])
-
-# 2. Multiplicative Cipher
-def multiplicative_encrypt(plaintext, key):
-    return ''.join([chr(((ord(char) - 65) * key) % 26 + 65) if char.isupper() else char for char in plaintext])
-
-def multiplicative_decrypt(ciphertext, key):
-    inv_key = mod_inverse(key, 26)
-    if inv_key is None:
-        return "Invalid key"
-    return ''.join([chr(((ord(char) - 65) * inv_key) % 26 + 65) if char.isupper() else char for char in ciphertext])
-
-# 3. Affine Cipher
-def affine_encrypt(plaintext, a, b):
-    return ''.join([chr((a * (ord(char) - 65) + b) % 26 + 65) if char.isupper() else char for char in plaintext])
-
-def affine_decrypt(ciphertext, a, b):
-    inv_a = mod_inverse(a, 26)
-    if inv_a is None:
-        return "Invalid key"
-    return ''.join([chr((inv_a * ((ord(char) - 65) - b)) % 26 + 65) if char.isupper() else char for char in ciphertext])
-
-# 4. Monoalphabetic Substitution Cipher
-def monoalphabetic_encrypt(plaintext, key):
-    alphabet = string.ascii_uppercase
-    substitution = str.maketrans(alphabet, key)
-    return plaintext.translate(substitution)
-
-def monoalphabetic_decrypt(ciphertext, key):
-    alphabet = string.ascii_uppercase
-    substitution = str.maketrans(key, alphabet)
-    return ciphertext.translate(substitution)
-
-# 5. Autokey Cipher
-def autokey_encrypt(plaintext, key):
-    key = clean_text(key)
-    extended_key = key + plaintext
-    return ''.join([chr((ord(plaintext[i]) - 65 + ord(extended_key[i]) - 65) % 26 + 65) for i in range(len(plaintext))])
-
-def autokey_decrypt(ciphertext, key):
-    key = clean_text(key)
-    decrypted = ''
-    for i in range(len(ciphertext)):
-        char = chr((ord(ciphertext[i]) - 65 - (ord(key[i % len(key)]) - 65)) % 26 + 65)
-        decrypted += char
-        key += char  # Extend the key
-    return decrypted
-
-# 6. Vigenère Cipher
-def vigenere_encrypt(plaintext, key):
-    key = clean_text(key)
-    encrypted = []
-    for i, char in enumerate(plaintext):
-        if char.isupper():
-            shift = ord(key[i % len(key)]) - 65
-            encrypted.append(chr((ord(char) - 65 + shift) % 26 + 65))
-        else:
-            encrypted.append(char)
-    return ''.join(encrypted)
-
-def vigenere_decrypt(ciphertext, key):
-    key = clean_text(key)
-    decrypted = []
-    for i, char in enumerate(ciphertext):
-        if char.isupper():
-            shift = ord(key[i % len(key)]) - 65
-            decrypted.append(chr((ord(char) - 65 - shift) % 26 + 65))
-        else:
-            decrypted.append(char)
-    return ''.join(decrypted)
-
-# 7. Playfair Cipher
-def playfair_encrypt(plaintext, key):
-    key = clean_text(key)
-    # Prepare the Playfair table
-    table = []
-    seen = set()
-    for char in key:
-        if char not in seen and char in string.ascii_uppercase:
-            seen.add(char)
-            table.append(char)
-    for char in string.ascii_uppercase:
-        if char not in seen and char != 'J':
-            seen.add(char)
-            table.append(char)
-    
-    # Create bigrams
-    plaintext = clean_text(plaintext).replace('J', 'I')
-    bigrams = []
-    i = 0
-    while i < len(plaintext):
-        if i + 1 < len(plaintext) and plaintext[i] == plaintext[i + 1]:
-            bigrams.append(plaintext[i] + 'X')
-            i += 1
-        else:
-            bigrams.append(plaintext[i:i + 2])
-            i += 2 if i + 1 < len(plaintext) else 1
-    
-    encrypted = ''
-    for bigram in bigrams:
-        a, b = bigram[0], bigram[1]
-        row_a, col_a = divmod(table.index(a), 5)
-        row_b, col_b = divmod(table.index(b), 5)
-        if row_a == row_b:  # Same row
-            encrypted += table[row_a * 5 + (col_a + 1) % 5]
-            encrypted += table[row_b * 5 + (col_b + 1) % 5]
-        elif col_a == col_b:  # Same column
-            encrypted += table[((row_a + 1) % 5) * 5 + col_a]
-            encrypted += table[((row_b + 1) % 5) * 5 + col_b]
-        else:  # Rectangle
-            encrypted += table[row_a * 5 + col_b]
-            encrypted += table[row_b * 5 + col_a]
-    return encrypted
-
-def playfair_decrypt(ciphertext, key):
-    key = clean_text(key)
-    # Prepare the Playfair table
-    table = []
-    seen = set()
-    for char in key:
-        if char not in seen and char in string.ascii_uppercase:
-            seen.add(char)
-            table.append(char)
-    for char in string.ascii_uppercase:
-        if char not in seen and char != 'J':
-            seen.add(char)
-            table.append(char)
-    
-    # Create bigrams
-    bigrams = [ciphertext[i:i + 2] for i in range(0, len(ciphertext), 2)]
-    decrypted = ''
-    for bigram in bigrams:
-        a, b = bigram[0], bigram[1]
-        row_a, col_a = divmod(table.index(a), 5)
-        row_b, col_b = divmod(table.index(b), 5)
-        if row_a == row_b:  # Same row
-            decrypted += table[row_a * 5 + (col_a - 1) % 5]
-            decrypted += table[row_b * 5 + (col_b - 1) % 5]
-        elif col_a == col_b:  # Same column
-            decrypted += table[((row_a - 1) % 5) * 5 + col_a]
-            decrypted += table[((row_b - 1) % 5) * 5 + col_b]
-        else:  # Rectangle
-            decrypted += table[row_a * 5 + col_b]
-            decrypted += table[row_b * 5 + col_a]
-    return decrypted
-
-# 8. Keyless Transposition Cipher
-def keyless_transposition_encrypt(plaintext):
-    plaintext = clean_text(plaintext)
-    n = len(plaintext)
-    cols = int(n * 0.5) + (n % int(n * 0.5) > 0)
-    grid = [''] * cols
-    for i in range(n):
-        grid[i % cols] += plaintext[i]
-    return ''.join(grid)
-
-def keyless_transposition_decrypt(ciphertext):
-    n = len(ciphertext)
-    cols = int(n ** 0.5)
-    rows = n // cols + (n % cols > 0)
-    grid = [''] * rows
-    for i in range(n):
-        grid[i // rows] += ciphertext[i]
-    return ''.join(grid)
-
-# 9. Keyed Transposition Cipher
-def keyed_transposition_encrypt(plaintext, key):
-    key = sorted(set(key), key=lambda k: key.index(k))  # Remove duplicates
-    key_length = len(key)
-    plaintext = clean_text(plaintext)
-    
-    cols = len(key)
-    rows = len(plaintext) // cols + (len(plaintext) % cols > 0)
-    grid = [''] * cols
-    
-    # Fill the grid column-wise
-    for i in range(len(plaintext)):
-        grid[i % cols] += plaintext[i]
-    
-    # Create the ciphertext by reading columns in key order
-    ciphertext = ''
-    for char in key:
-        idx = key.index(char)
-        ciphertext += grid[idx]
-    return ciphertext
-
-def keyed_transposition_decrypt(ciphertext, key):
-    key = sorted(set(key), key=lambda k: key.index(k))  # Remove duplicates
-    key_length = len(key)
-    
-    cols = len(key)
-    rows = len(ciphertext) // cols + (len(ciphertext) % cols > 0)
-    grid = [''] * cols
-    
-    # Distribute ciphertext in the grid
-    for i in range(len(ciphertext)):
-        grid[i % cols] += ciphertext[i]
-    
-    # Create the plaintext by reading rows in original order
-    plaintext = ''
-    for char in key:
-        idx = key.index(char)
-        plaintext += grid[idx]
-    return plaintext
-
-import math
-
-# Utility function to clean text (remove spaces and convert to uppercase)
-def clean_text(text):
-    return text.replace(' ', '').upper()
-
-# Keyless Transposition Cipher
-def keyless_transposition_encrypt(plaintext):
-    plaintext = clean_text(plaintext)
-    cols = math.ceil(math.sqrt(len(plaintext)))  # Calculate number of columns
-    grid = [''] * cols
-    for i in range(len(plaintext)):
-        grid[i % cols] += plaintext[i]
-    return ''.join(grid)
-
-def keyless_transposition_decrypt(ciphertext):
-    ciphertext = clean_text(ciphertext)
-    cols = math.ceil(math.sqrt(len(ciphertext)))
-    rows = math.ceil(len(ciphertext) / cols)
-    grid = [''] * rows
-    k = 0
-    for i in range(cols):
-        for j in range(rows):
-            if k < len(ciphertext):
-                grid[j] += ciphertext[k]
-                k += 1
-    return ''.join(grid)
-import math
-
-# Utility function to clean text (remove spaces and convert to uppercase)
-def clean_text(text):
-    return text.replace(' ', '').upper()
-
-# Keyless Transposition Cipher (already working fine)
-def keyless_transposition_encrypt(plaintext):
-    plaintext = clean_text(plaintext)
-    cols = math.ceil(math.sqrt(len(plaintext)))  # Calculate number of columns
-    grid = [''] * cols
-    for i in range(len(plaintext)):
-        grid[i % cols] += plaintext[i]
-    return ''.join(grid)
-
-def keyless_transposition_decrypt(ciphertext):
-    ciphertext = clean_text(ciphertext)
-    cols = math.ceil(math.sqrt(len(ciphertext)))
-    rows = math.ceil(len(ciphertext) / cols)
-    grid = [''] * rows
-    k = 0
-    for i in range(cols):
-        for j in range(rows):
-            if k < len(ciphertext):
-                grid[j] += ciphertext[k]
-                k += 1
-    return ''.join(grid)
-
-import math
-
-# Utility function to clean text (remove spaces and convert to uppercase)
-def clean_text(text):
-    return text.replace(' ', '').upper()
-
-# Keyless Transposition Cipher (already working fine)
-def keyless_transposition_encrypt(plaintext):
-    plaintext = clean_text(plaintext)
-    cols = math.ceil(math.sqrt(len(plaintext)))  # Calculate number of columns
-    grid = [''] * cols
-    for i in range(len(plaintext)):
-        grid[i % cols] += plaintext[i]
-    return ''.join(grid)
-
-def keyless_transposition_decrypt(ciphertext):
-    ciphertext = clean_text(ciphertext)
-    cols = math.ceil(math.sqrt(len(ciphertext)))
-    rows = math.ceil(len(ciphertext) / cols)
-    grid = [''] * rows
-    k = 0
-    for i in range(cols):
-        for j in range(rows):
-            if k < len(ciphertext):
-                grid[j] += ciphertext[k]
-                k += 1
-    return ''.join(grid)
-
-# Keyed Transposition Cipher (fixed implementation)
-def keyed_transposition_encrypt(plaintext, key):
-    plaintext = clean_text(plaintext)
-    key = clean_text(key)
-    cols = len(key)
-    rows = math.ceil(len(plaintext) / cols)
-    
-    # Padding plaintext with 'X' if necessary
-    padded_plaintext = plaintext + 'X' * (rows * cols - len(plaintext))
-    
-    # Fill the grid row by row
-    grid = [''] * rows
-    k = 0
-    for i in range(rows):
-        for j in range(cols):
-            grid[i] += padded_plaintext[k]
-            k += 1
-
-    # Sort the key to get the order of the columns
-    key_order = sorted(range(len(key)), key=lambda x: key[x])
-
-    # Read the grid column by column based on key order
-    ciphertext = ''
-    for col in key_order:
-        for row in grid:
-            ciphertext += row[col]
-
-    return ciphertext
-
-def keyed_transposition_decrypt(ciphertext, key):
-    ciphertext = clean_text(ciphertext)
-    key = clean_text(key)
-    cols = len(key)
-    rows = math.ceil(len(ciphertext) / cols)
-
-    # Sort the key to get the column order
-    key_order = sorted(range(len(key)), key=lambda x: key[x])
-
-    # Prepare grid with empty strings
-    grid = [''] * rows
-    for i in range(rows):
-        grid[i] = [''] * cols
-
-    # Fill the grid column by column based on key order
-    index = 0
-    for col in key_order:
-        for row in range(rows):
-            if index < len(ciphertext):
-                grid[row][col] = ciphertext[index]
-                index += 1
-
-    # Read row by row to decrypt
-    plaintext = ''.join(''.join(row) for row in grid).rstrip('X')  # Remove padding 'X'
-    return plaintext
-
-# Double Transposition Cipher (fixed implementation)
-def double_transposition_encrypt(plaintext, key1, key2):
-    # First transposition with key1
-    first_transposition = keyed_transposition_encrypt(plaintext, key1)
-    # Second transposition with key2
-    second_transposition = keyed_transposition_encrypt(first_transposition, key2)
-    return second_transposition
-
-def double_transposition_decrypt(ciphertext, key1, key2):
-    # First decryption with key2
-    first_decryption = keyed_transposition_decrypt(ciphertext, key2)
-    # Second decryption with key1
-    second_decryption = keyed_transposition_decrypt(first_decryption, key1)
-    return second_decryption
-
+import os
+import sys
+
+from registry import CIPHERS
+
+# The interactive menu and the command line. Both find ciphers in
+# registry.CIPHERS and import the engines in ciphers.py only once a cipher is
+# run. Other names are looked up in ciphers, so code written against the
+# single-module layout, such as main.vigenere_encrypt(...), keeps working.
+def __getattr__(name):
+    import ciphers
+    try:
+        return getattr(ciphers, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
 
 # CLI Interface
 def cipher_menu():
     print("\nChoose a cipher:")
-    print("1. Additive Cipher")
-    print("2. Multiplicative Cipher")
-    print("3. Affine Cipher")
-    print("4. Monoalphabetic Substitution Cipher")
-    print("5. Autokey Cipher")
-    print("6. Vigenère Cipher")
-    print("7. Playfair Cipher")
-    print("8. Keyless Transposition Cipher")
-    print("9. Keyed Transposition Cipher")
-    print("10. Double Transposition Cipher")
-    print("11. Exit")
-    return input("Enter your choice (1-11): ")
+    for number, cipher in enumerate(CIPHERS.values(), 1):
+        print(f"{number}. {cipher.title}")
+    print(f"{len(CIPHERS) + 1}. Exit")
+    return input(f"Enter your choice (1-{len(CIPHERS) + 1}): ")
 
 def operation_menu():
     print("\n1. Encrypt")
@@ -400,177 +29,332 @@ def operation_menu():
     return input("Choose an operation (1-3): ")
 
 def cli():
+    choices = {str(number): name for number, name in enumerate(CIPHERS, 1)}
     while True:
         cipher_choice = cipher_menu()
 
-        if cipher_choice == "1":  # Additive Cipher
+        if cipher_choice in choices:
+            name = choices[cipher_choice]
+            import ciphers
+            params = CIPHERS[name].params
             while True:
                 operation = operation_menu()
                 if operation == "1":  # Encrypt
                     plaintext = input("Enter the text to encrypt (Uppercase only): ").upper()
-                    key = int(input("Enter the key (integer): "))
-                    print(f"Encrypted text: {additive_encrypt(plaintext, key)}")
+                    key = [param.convert(input(param.prompt)) for param in params]
+                    print(f"Encrypted text: {ciphers.transform_text(name, 'encrypt', plaintext, key)}")
                 elif operation == "2":  # Decrypt
                     ciphertext = input("Enter the text to decrypt (Uppercase only): ").upper()
-                    key = int(input("Enter the key (integer): "))
-                    print(f"Decrypted text: {additive_decrypt(ciphertext, key)}")
+                    key = [param.convert(input(param.prompt)) for param in params]
+                    print(f"Decrypted text: {ciphers.transform_text(name, 'decrypt', ciphertext, key)}")
                 elif operation == "3":  # Back to main menu
                     break
                 else:
                     print("Invalid choice. Please try again.")
 
-        elif cipher_choice == "2":  # Multiplicative Cipher
-            while True:
-                operation = operation_menu()
-                if operation == "1":  # Encrypt
-                    plaintext = input("Enter the text to encrypt (Uppercase only): ").upper()
-                    key = int(input("Enter the key (integer, relatively prime to 26): "))
-                    print(f"Encrypted text: {multiplicative_encrypt(plaintext, key)}")
-                elif operation == "2":  # Decrypt
-                    ciphertext = input("Enter the text to decrypt (Uppercase only): ").upper()
-                    key = int(input("Enter the key (integer, relatively prime to 26): "))
-                    print(f"Decrypted text: {multiplicative_decrypt(ciphertext, key)}")
-                elif operation == "3":  # Back to main menu
-                    break
-                else:
-                    print("Invalid choice. Please try again.")
-
-        elif cipher_choice == "3":  # Affine Cipher
-            while True:
-                operation = operation_menu()
-                if operation == "1":  # Encrypt
-                    plaintext = input("Enter the text to encrypt (Uppercase only): ").upper()
-                    a = int(input("Enter the 'a' key (integer, relatively prime to 26): "))
-                    b = int(input("Enter the 'b' key (integer): "))
-                    print(f"Encrypted text: {affine_encrypt(plaintext, a, b)}")
-                elif operation == "2":  # Decrypt
-                    ciphertext = input("Enter the text to decrypt (Uppercase only): ").upper()
-                    a = int(input("Enter the 'a' key (integer, relatively prime to 26): "))
-                    b = int(input("Enter the 'b' key (integer): "))
-                    print(f"Decrypted text: {affine_decrypt(ciphertext, a, b)}")
-                elif operation == "3":  # Back to main menu
-                    break
-                else:
-                    print("Invalid choice. Please try again.")
-
-        elif cipher_choice == "4":  # Monoalphabetic Substitution Cipher
-            while True:
-                operation = operation_menu()
-                if operation == "1":  # Encrypt
-                    plaintext = input("Enter the text to encrypt (Uppercase only): ").upper()
-                    key = input("Enter the substitution key (26 unique letters): ").upper()
-                    print(f"Encrypted text: {monoalphabetic_encrypt(plaintext, key)}")
-                elif operation == "2":  # Decrypt
-                    ciphertext = input("Enter the text to decrypt (Uppercase only): ").upper()
-                    key = input("Enter the substitution key (26 unique letters): ").upper()
-                    print(f"Decrypted text: {monoalphabetic_decrypt(ciphertext, key)}")
-                elif operation == "3":  # Back to main menu
-                    break
-                else:
-                    print("Invalid choice. Please try again.")
-
-        elif cipher_choice == "5":  # Autokey Cipher
-            while True:
-                operation = operation_menu()
-                if operation == "1":  # Encrypt
-                    plaintext = input("Enter the text to encrypt (Uppercase only): ").upper()
-                    key = input("Enter the key (Uppercase letters only): ").upper()
-                    print(f"Encrypted text: {autokey_encrypt(plaintext, key)}")
-                elif operation == "2":  # Decrypt
-                    ciphertext = input("Enter the text to decrypt (Uppercase only): ").upper()
-                    key = input("Enter the key (Uppercase letters only): ").upper()
-                    print(f"Decrypted text: {autokey_decrypt(ciphertext, key)}")
-                elif operation == "3":  # Back to main menu
-                    break
-                else:
-                    print("Invalid choice. Please try again.")
-
-        elif cipher_choice == "6":  # Vigenère Cipher
-            while True:
-                operation = operation_menu()
-                if operation == "1":  # Encrypt
-                    plaintext = input("Enter the text to encrypt (Uppercase only): ").upper()
-                    key = input("Enter the key (Uppercase letters only): ").upper()
-                    print(f"Encrypted text: {vigenere_encrypt(plaintext, key)}")
-                elif operation == "2":  # Decrypt
-                    ciphertext = input("Enter the text to decrypt (Uppercase only): ").upper()
-                    key = input("Enter the key (Uppercase letters only): ").upper()
-                    print(f"Decrypted text: {vigenere_decrypt(ciphertext, key)}")
-                elif operation == "3":  # Back to main menu
-                    break
-                else:
-                    print("Invalid choice. Please try again.")
-
-        elif cipher_choice == "7":  # Playfair Cipher
-            while True:
-                operation = operation_menu()
-                if operation == "1":  # Encrypt
-                    plaintext = input("Enter the text to encrypt (Uppercase only): ").upper()
-                    key = input("Enter the key (Uppercase letters only): ").upper()
-                    print(f"Encrypted text: {playfair_encrypt(plaintext, key)}")
-                elif operation == "2":  # Decrypt
-                    ciphertext = input("Enter the text to decrypt (Uppercase only): ").upper()
-                    key = input("Enter the key (Uppercase letters only): ").upper()
-                    print(f"Decrypted text: {playfair_decrypt(ciphertext, key)}")
-                elif operation == "3":  # Back to main menu
-                    break
-                else:
-                    print("Invalid choice. Please try again.")
-
-        elif cipher_choice == "8":  # Keyless Transposition Cipher
-            while True:
-                operation = operation_menu()
-                if operation == "1":  # Encrypt
-                    plaintext = input("Enter the text to encrypt (Uppercase only): ").upper()
-                    print(f"Encrypted text: {keyless_transposition_encrypt(plaintext)}")
-                elif operation == "2":  # Decrypt
-                    ciphertext = input("Enter the text to decrypt (Uppercase only): ").upper()
-                    print(f"Decrypted text: {keyless_transposition_decrypt(ciphertext)}")
-                elif operation == "3":  # Back to main menu
-                    break
-                else:
-                    print("Invalid choice. Please try again.")
-
-        elif cipher_choice == "9":  # Keyed Transposition Cipher
-            while True:
-                operation = operation_menu()
-                if operation == "1":  # Encrypt
-                    plaintext = input("Enter the text to encrypt (Uppercase only): ").upper()
-                    key = input("Enter the key (Unique letters): ").upper()
-                    print(f"Encrypted text: {keyed_transposition_encrypt(plaintext, key)}")
-                elif operation == "2":  # Decrypt
-                    ciphertext = input("Enter the text to decrypt (Uppercase only): ").upper()
-                    key = input("Enter the key (Unique letters): ").upper()
-                    print(f"Decrypted text: {keyed_transposition_decrypt(ciphertext, key)}")
-                elif operation == "3":  # Back to main menu
-                    break
-                else:
-                    print("Invalid choice. Please try again.")
-
-        elif cipher_choice == "10":  # Double Transposition Cipher
-            while True:
-                operation = operation_menu()
-                if operation == "1":  # Encrypt
-                    plaintext = input("Enter the text to encrypt (Uppercase only): ").upper()
-                    key1 = input("Enter the first key (Unique letters): ").upper()
-                    key2 = input("Enter the second key (Unique letters): ").upper()
-                    print(f"Encrypted text: {double_transposition_encrypt(plaintext, key1, key2)}")
-                elif operation == "2":  # Decrypt
-                    ciphertext = input("Enter the text to decrypt (Uppercase only): ").upper()
-                    key1 = input("Enter the first key (Unique letters): ").upper()
-                    key2 = input("Enter the second key (Unique letters): ").upper()
-                    print(f"Decrypted text: {double_transposition_decrypt(ciphertext, key1, key2)}")
-                elif operation == "3":  # Back to main menu
-                    break
-                else:
-                    print("Invalid choice. Please try again.")
-
-        elif cipher_choice == "11":  # Exit
+        elif cipher_choice == str(len(CIPHERS) + 1):  # Exit
             print("Goodbye!")
             break
 
         else:
             print("Invalid choice. Please try again.")
 
+# Command line entry point
+def build_parser():
+    import argparse
+    parser = argparse.ArgumentParser(description="Classical cipher tool. Run without arguments for the interactive menu.")
+    parser.add_argument('--profile', action='store_true', help="print call counts and timings to stderr at exit")
+    parser.add_argument('--profile-out', metavar='FILE', help="write call counts and timings to FILE as JSON at exit")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for command in ('encrypt', 'decrypt'):
+        sub = commands.add_parser(command, help=f"{command} a file, a directory of files or stdin")
+        sub.add_argument('--cipher', required=True, choices=list(CIPHERS))
+        sub.add_argument('--key', action='append', default=[],
+                         help="cipher key; repeat for ciphers with two keys (--key A --key B)")
+        sub.add_argument('--in', dest='input', default='-', help="input file or directory (default: stdin)")
+        sub.add_argument('--out', dest='output', default='-', help="output file or directory (default: stdout)")
+        sub.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                         help="worker processes for a directory or a large file (default: CPU count)")
+        sub.add_argument('--chunk-size', type=_positive_int, help="characters per chunk when streaming")
+        sub.add_argument('--bytes', action='store_true',
+                         help="process raw bytes through memory maps instead of decoding text; only ASCII is changed, and key "
+                              "positions count bytes, so decrypt --bytes output with --bytes")
+        if command == 'decrypt':
+            sub.add_argument('--range', type=_range,
+                             help="decrypt only bytes START:END of the --in file (plaintext positions for "
+                                  "transpositions)")
+        sub.add_argument('--alphabet', type=_alphabet,
+                         help="'uppercase' (default), 'printable' or the characters of a custom alphabet, "
+                              "for substitution and Vigenere-family ciphers")
+
+    crack = commands.add_parser('crack', help="recover the key of a ciphertext")
+    crack.add_argument('--cipher', required=True, choices=['additive', 'affine', 'vigenere', 'autokey', 'monoalphabetic',
+                                                             'playfair', 'double_transposition'])
+    crack.add_argument('--in', dest='input', default='-', help="ciphertext file (default: stdin)")
+    crack.add_argument('--top', type=int, default=5, help="number of candidates to show")
+    crack.add_argument('--statistic', choices=['chi-squared', 'log-likelihood'], default='chi-squared')
+    crack.add_argument('--max-length', type=_positive_int, default=200, help="longest Vigenere key length to try")
+    crack.add_argument('--key-length', type=_positive_int, help="skip key length detection for Vigenere")
+    crack.add_argument('--time', type=float, help="seconds to search for key search solvers (default: 10, 60 for Playfair)")
+    crack.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                       help="worker processes for key search solvers (default: CPU count)")
+    crack.add_argument('--seed', type=int, help="random seed for key search solvers")
+    crack.add_argument('--corpus', help="English text to build n-gram statistics from")
+    crack.add_argument('--iterations', type=int, help="iterations per Playfair annealing run")
+    crack.add_argument('--lengths1', type=_lengths, help="double transposition key1 length(s), e.g. 7 or 5-9")
+    crack.add_argument('--lengths2', type=_lengths, help="double transposition key2 length(s), e.g. 7 or 5-9")
+    crack.add_argument('--ngrams', choices=['quadgram', 'bigram'], default='quadgram',
+                       help="statistic for double transposition candidates")
+    crack.add_argument('--wordlist', help="file of candidate keys, one per line, tried instead of searching "
+                                          "(required for autokey)")
+    return parser
+
+def _alphabet(value):
+    import ciphers
+    return ciphers.ALPHABETS.get(value) or ciphers.Alphabet(value)
+
+def _range(value):
+    # "start:end" in bytes
+    start, separator, end = value.partition(':')
+    if not separator or int(start) < 0 or int(end) < int(start):
+        raise ValueError(value)
+    return int(start), int(end)
+
+def _positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise ValueError(value)
+    return number
+
+def _lengths(value):
+    # "7", "5-9" or "5,7,9"
+    lengths = []
+    for part in value.split(','):
+        low, _, high = part.partition('-')
+        lengths.extend(range(int(low), int(high or low) + 1))
+    if not lengths or min(lengths) < 1:
+        raise ValueError(value)
+    return lengths
+
+def _directory_tasks(input_dir, output_dir):
+    # Mirror every file under input_dir into output_dir
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        target = os.path.join(output_dir, os.path.relpath(root, input_dir))
+        for filename in sorted(files):
+            yield os.path.join(root, filename), os.path.join(target, filename)
+
+def _run_file(name, command, key, source, destination, chunk_size, jobs=1, binary=False):
+    # Write through a temporary file so a failure leaves no partial output
+    import ciphers
+    os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+    partial = destination + '.part'
+    try:
+        ciphers.transform_file(name, command, key, source, partial, chunk_size, jobs, binary)
+        os.replace(partial, destination)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+def run_batch(name, command, key, tasks, jobs, chunk_size=None, binary=False):
+    # Fan (source, destination) pairs out over a process pool, keeping at most
+    # 2 * jobs files in flight. Returns the number of files that failed.
+    if chunk_size is None:
+        import ciphers
+        chunk_size = ciphers.CHUNK_SIZE
+    failures = 0
+
+    def report(source, error):
+        nonlocal failures
+        failures += 1
+        print(f"Error: {source}: {error}", file=sys.stderr)
+
+    if jobs <= 1:
+        for source, destination in tasks:
+            try:
+                _run_file(name, command, key, source, destination, chunk_size, 1, binary)
+            except Exception as e:
+                report(source, e)
+        return failures
+
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    pending = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for source, destination in tasks:
+            if len(pending) >= 2 * jobs:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _finish(future, pending.pop(future), report)
+            future = pool.submit(_run_file, name, command, key, source, destination, chunk_size, 1, binary)
+            pending[future] = source
+        for future in list(pending):
+            _finish(future, pending.pop(future), report)
+    return failures
+
+def _finish(future, source, report):
+    try:
+        future.result()
+    except Exception as e:
+        report(source, e)
+
+def run_command(parser, options):
+    import ciphers
+    cipher = CIPHERS[options.cipher]
+    params = cipher.params
+    if len(options.key) != len(params):
+        parser.error(f"{options.cipher} takes {len(params)} --key value(s)")
+    if options.alphabet is not None and not cipher.alphabets:
+        parser.error(f"{options.cipher} does not take --alphabet")
+    try:
+        key = ciphers.parse_key(options.cipher, options.key, options.alphabet)
+    except ValueError as e:
+        parser.error(f"invalid key: {e}")
+    chunk_size = ciphers.CHUNK_SIZE if options.chunk_size is None else options.chunk_size
+
+    if getattr(options, 'range', None) is not None:
+        if options.input == '-' or os.path.isdir(options.input):
+            parser.error("--range needs an --in file")
+        try:
+            result = ciphers.decrypt_range(options.cipher, key, options.input, *options.range, binary=options.bytes)
+            if not options.bytes:
+                result = result.encode('utf-8', 'surrogateescape')
+            if options.output == '-':
+                sys.stdout.flush()
+                sys.stdout.buffer.write(result)
+            else:
+                with open(options.output, 'wb') as f:
+                    f.write(result)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        return 0
+
+    if os.path.isdir(options.input):
+        if options.output == '-' or os.path.isfile(options.output):
+            parser.error("--out must be a directory when --in is a directory")
+        tasks = _directory_tasks(options.input, options.output)
+        failures = run_batch(options.cipher, options.command, key, tasks, options.jobs, chunk_size, options.bytes)
+        return 1 if failures else 0
+
+    try:
+        if options.output == '-':
+            ciphers.transform_file(options.cipher, options.command, key, options.input, '-', chunk_size,
+                                   options.jobs, options.bytes)
+        else:
+            _run_file(options.cipher, options.command, key, options.input, options.output, chunk_size, options.jobs,
+                      options.bytes)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+def run_crack(parser, options):
+    import analysis
+    import ciphers
+    with ciphers.open_text(options.input, 'r') as src:
+        ciphertext = src.read()
+    if options.cipher == 'autokey' and not options.wordlist:
+        parser.error("autokey needs --wordlist")
+    if options.wordlist and options.cipher in ('vigenere', 'autokey'):
+        return run_dictionary(options, ciphertext)
+    if options.cipher == 'vigenere':
+        solution = analysis.solve_vigenere(ciphertext, options.key_length, options.max_length,
+                                           statistic=options.statistic)
+        print_vigenere(solution, options.top)
+        return 0
+    if options.cipher in ('monoalphabetic', 'playfair', 'double_transposition'):
+        try:
+            return run_search(options, ciphertext)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    if options.cipher == 'additive':
+        candidates = analysis.crack_additive(ciphertext, options.statistic)
+    else:
+        candidates = analysis.crack_affine(ciphertext, options.statistic)
+    print_candidates(options.cipher, ciphertext, candidates[:options.top])
+    return 0
+
+def run_dictionary(options, ciphertext):
+    import solvers
+    settings = {'corpus': options.corpus} if options.corpus else {}
+    try:
+        result = solvers.dictionary_attack(ciphertext, options.wordlist, options.cipher, options.top, options.jobs,
+                                           **settings)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{result.words} words, {result.survivors} decrypted in {result.elapsed:.1f} s", file=sys.stderr)
+    for candidate in result.candidates:
+        preview = candidate.plaintext[:60].replace('\n', ' ')
+        print(f"{candidate.key}\t{candidate.score:.3f}\t{preview}")
+    return 0
+
+def run_search(options, ciphertext):
+    import solvers
+    settings = {'jobs': options.jobs, 'seed': options.seed}
+    for option, setting in (('time', 'time_budget'), ('corpus', 'corpus'), ('iterations', 'iterations')):
+        if getattr(options, option) is not None:
+            settings[setting] = getattr(options, option)
+    if options.cipher == 'monoalphabetic':
+        settings.pop('iterations', None)
+        solution = solvers.solve_substitution(ciphertext, **settings)
+        print(f"score {solution.score:.3f}\t{solution.climbs} climbs in {solution.elapsed:.1f} s", file=sys.stderr)
+    elif options.cipher == 'playfair':
+        solution = solvers.solve_playfair(ciphertext, **settings)
+        print(f"score {solution.score:.3f}\t{solution.runs} runs in {solution.elapsed:.1f} s", file=sys.stderr)
+    else:
+        settings.pop('iterations', None)
+        if not options.lengths1 or not options.lengths2:
+            raise ValueError("double transposition needs --lengths1 and --lengths2")
+        if options.wordlist:
+            with open(options.wordlist, encoding='utf-8') as f:
+                settings['words'] = [line.strip() for line in f if line.strip()]
+        # Every character is transposed, so drop the newline a text file ends with
+        solution = solvers.solve_double_transposition(ciphertext.rstrip('\r\n'), options.lengths1, options.lengths2,
+                                                      statistic=options.ngrams, **settings)
+        print(f"score {solution.score:.3f}\t{solution.candidates} candidates in {solution.elapsed:.1f} s "
+              f"({solution.rate:.0f}/s)", file=sys.stderr)
+        print_solution(f"{solution.key1} {solution.key2}", solution.plaintext)
+        return 0
+    print_solution(solution.key, solution.plaintext)
+    return 0
+
+def print_candidates(name, ciphertext, candidates):
+    # One line per candidate: key, score and the start of its plaintext
+    import ciphers
+    for candidate in candidates:
+        key = candidate.key if isinstance(candidate.key, tuple) else (candidate.key,)
+        preview = ciphers.transform_text(name, 'decrypt', ciphertext[:60], key).replace('\n', ' ')
+        print(f"{' '.join(map(str, key))}\t{candidate.score:.3f}\t{preview}")
+
+def print_vigenere(solution, top):
+    # Likely key lengths and stage timings go to stderr, the key to stdout
+    for candidate in solution.lengths[:top]:
+        print(f"length {candidate.length}\tcoincidence {candidate.coincidence:.1f}\t"
+              f"kasiski {candidate.kasiski:.2f}", file=sys.stderr)
+    timings = ', '.join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in solution.timings.items())
+    print(f"timings: {timings}", file=sys.stderr)
+    print_solution(solution.key, solution.plaintext)
+
+def print_solution(key, plaintext):
+    preview = plaintext[:60].replace('\n', ' ')
+    print(f"{key}\t{preview}")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        cli()
+        return 0
+    parser = build_parser()
+    options = parser.parse_args(argv)
+    if options.profile or options.profile_out:
+        import ciphers
+        ciphers.start_profiling(options.profile_out or '-')
+    if options.command == 'crack':
+        return run_crack(parser, options)
+    return run_command(parser, options)
+
 if __name__ == "__main__":
-    cli()
+    sys.exit(main())
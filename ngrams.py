@@ -0,0 +1,228 @@
+import math
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+# Letter n-gram counts, unigrams through quadgrams, over raw bytes
+# Letters are reduced to codes 0-25 with one bytes.translate that also drops
+# everything else, so n-grams run across spaces and punctuation and no
+# uppercase copy of the text is made. Quadgrams are counted by casting the
+# codes to 32-bit words at each of the four alignments and letting Counter
+# tally them in C; the lower orders are then read off the distinct
+# quadgrams. Counts of consecutive pieces of text merge exactly, n-grams
+# across the join included, so a file can be counted in chunks or in
+# parallel byte ranges.
+
+ORDERS = 4
+SIZES = [26 ** order for order in range(1, ORDERS + 1)]
+CHUNK_SIZE = 1 << 22
+
+_MAGIC = b'NGRM'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHB3s3sBB')
+
+def _letter_table(fold_case):
+    # (table, delete) for bytes.translate
+    table = bytearray(range(256))
+    letters = set(range(65, 91))
+    for code in range(65, 91):
+        table[code] = code - 65
+    if fold_case:
+        letters.update(range(97, 123))
+        for code in range(97, 123):
+            table[code] = code - 97
+    return bytes(table), bytes(code for code in range(256) if code not in letters)
+
+_TABLES = {True: _letter_table(True), False: _letter_table(False)}
+
+class NgramCounts:
+    # counts[k] holds the (k + 1)-gram counts indexed in base 26. head and
+    # tail are the first and last three letter codes, for merging.
+    __slots__ = ('counts', 'head', 'tail', 'fold_case')
+
+    def __init__(self, fold_case=True):
+        self.counts = [array('q', bytes(8 * size)) for size in SIZES]
+        self.head = b''
+        self.tail = b''
+        self.fold_case = fold_case
+
+    @property
+    def letters(self):
+        return sum(self.counts[0])
+
+    def total(self, order):
+        return sum(self.counts[order - 1])
+
+    def update(self, data):
+        # Count bytes that directly follow the text counted so far
+        table, delete = _TABLES[self.fold_case]
+        self._extend(bytes(data).translate(table, delete))
+
+    def _extend(self, codes):
+        if not codes:
+            return
+        joined = self.tail + codes
+        _count(joined, self.counts, 1)
+        _count(self.tail, self.counts, -1)
+        if len(self.head) < 3:
+            self.head = (self.head + codes)[:3]
+        self.tail = joined[-3:]
+
+    def merge(self, other):
+        # Add the counts of text that directly follows this one
+        if other.fold_case != self.fold_case:
+            raise ValueError("cannot merge counts with different case folding")
+        if not other.head:
+            return self
+        for mine, theirs in zip(self.counts, other.counts):
+            for index, count in enumerate(theirs):
+                if count:
+                    mine[index] += count
+        _count(self.tail + other.head, self.counts, 1)
+        _count(self.tail, self.counts, -1)
+        _count(other.head, self.counts, -1)
+        if len(self.head) < 3:
+            self.head = (self.head + other.head)[:3]
+        self.tail = (self.tail + other.tail)[-3:]
+        return self
+
+    def log_probabilities(self, order, floor=0.1):
+        # Flat table of log10 probabilities; unseen n-grams count as floor
+        counts = self.counts[order - 1]
+        total = sum(counts)
+        if not total:
+            raise ValueError(f"no {order}-grams counted")
+        unseen = math.log10(floor / total)
+        log10 = math.log10
+        return array('d', [log10(count / total) if count else unseen for count in counts])
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, self.fold_case, self.head.ljust(3, b'\xff'),
+                                 self.tail.ljust(3, b'\xff'), len(self.head), len(self.tail)))
+            for counts in self.counts:
+                if sys.byteorder == 'big':
+                    counts = array('q', counts)
+                    counts.byteswap()
+                data = zlib.compress(counts.tobytes(), 6)
+                f.write(struct.pack('<Q', len(data)))
+                f.write(data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise ValueError(f"{path} is not an n-gram file")
+            magic, version, fold_case, head, tail, head_length, tail_length = _HEADER.unpack(header)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"{path} is not an n-gram file")
+            self = cls(bool(fold_case))
+            self.head, self.tail = head[:head_length], tail[:tail_length]
+            for counts, size in zip(self.counts, SIZES):
+                length, = struct.unpack('<Q', f.read(8))
+                data = zlib.decompress(f.read(length))
+                if len(data) != 8 * size:
+                    raise ValueError(f"{path} is truncated")
+                counts[:] = array('q', data)
+                if sys.byteorder == 'big':
+                    counts.byteswap()
+        return self
+
+def _count(codes, counts, sign):
+    # Add sign times every n-gram of codes into counts
+    n = len(codes)
+    unigrams, bigrams, trigrams, quadgrams = counts
+    if n >= 4:
+        words = Counter()
+        for offset in range(4):
+            usable = (n - offset) // 4 * 4
+            words.update(memoryview(codes)[offset:offset + usable].cast('I'))
+        little = sys.byteorder == 'little'
+        for word, count in words.items():
+            if little:
+                a, b, c, d = word & 255, word >> 8 & 255, word >> 16 & 255, word >> 24
+            else:
+                a, b, c, d = word >> 24, word >> 16 & 255, word >> 8 & 255, word & 255
+            count *= sign
+            index = ((a * 26 + b) * 26 + c) * 26 + d
+            quadgrams[index] += count
+            trigrams[index // 26] += count
+            bigrams[index // 676] += count
+            unigrams[a] += count
+    # The last three positions start no quadgram
+    for start in range(max(0, n - 3), n):
+        index = 0
+        for order, code in enumerate(codes[start:start + 3]):
+            index = index * 26 + code
+            counts[order][index] += sign
+
+def count_bytes(data, fold_case=True):
+    counts = NgramCounts(fold_case)
+    counts.update(data)
+    return counts
+
+def _count_range(path, start, end, fold_case, chunk_size):
+    counts = NgramCounts(fold_case)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while start < end:
+            data = f.read(min(chunk_size, end - start))
+            if not data:
+                break
+            counts.update(data)
+            start += len(data)
+    return counts
+
+def count_file(path, jobs=1, fold_case=True, chunk_size=CHUNK_SIZE):
+    # Count a file in byte ranges on jobs processes. Ranges may split a
+    # multi-byte character, but those bytes are never letters.
+    size = os.path.getsize(path)
+    if jobs <= 1 or size <= chunk_size:
+        return _count_range(path, 0, size, fold_case, chunk_size)
+    from concurrent.futures import ProcessPoolExecutor
+    bounds = [size * i // jobs for i in range(jobs + 1)]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(_count_range, path, start, end, fold_case, chunk_size)
+                   for start, end in zip(bounds, bounds[1:])]
+        counts = futures[0].result()
+        for future in futures[1:]:
+            counts.merge(future.result())
+    return counts
+
+@lru_cache(maxsize=None)
+def corpus_counts(path):
+    # Counts for a reference corpus, cached in a path + '.ngrams' file that
+    # is rebuilt when the corpus is newer
+    cache = path + '.ngrams'
+    try:
+        if os.path.getmtime(cache) >= os.path.getmtime(path):
+            return NgramCounts.load(cache)
+    except (OSError, ValueError):
+        pass
+    counts = count_file(path)
+    try:
+        counts.save(cache)
+    except OSError:
+        pass
+    return counts
+
+def main_ngrams(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Count letter n-grams of a text file into a binary table")
+    parser.add_argument('input')
+    parser.add_argument('--out', help="n-gram file to write (default: INPUT.ngrams)")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    parser.add_argument('--case-sensitive', action='store_true', help="count uppercase letters only")
+    options = parser.parse_args(argv)
+    counts = count_file(options.input, options.jobs, not options.case_sensitive)
+    counts.save(options.out or options.input + '.ngrams')
+    for order in range(1, ORDERS + 1):
+        print(f"{order}-grams: {counts.total(order)}")
+
+if __name__ == "__main__":
+    main_ngrams()
@@ -0,0 +1,82 @@
+from collections import namedtuple
+from importlib import import_module
+
+# Cipher registry
+# Every cipher is declared here once: its name, menu title, the key values it
+# takes and what it can do. A declaration names the module and context class
+# that implement the cipher instead of importing them, so listing ciphers,
+# building the menu or the command line and counting key values cost nothing;
+# the module is imported the first time encrypt, decrypt or context is used.
+# A cipher's module defines NAME_encrypt and NAME_decrypt functions and its
+# context class. Capabilities:
+#   stream     the context has encryptor()/decryptor() and byte_encryptor()/
+#              byte_decryptor(), so files are processed chunk by chunk
+#   seek       its streams can start at any character position, so large files
+#              are split across processes and ranges are decrypted in place
+#   alphabets  it takes an Alphabet after its key values
+KeyParam = namedtuple('KeyParam', 'prompt convert')
+
+class Cipher:
+    __slots__ = ('name', 'title', 'params', 'context_name', 'capabilities', 'module')
+
+    def __init__(self, name, title, params, context_name, capabilities=(), module='ciphers'):
+        self.name = name
+        self.title = title
+        self.params = params
+        self.context_name = context_name
+        self.capabilities = frozenset(capabilities)
+        self.module = module
+
+    def __repr__(self):
+        return f"Cipher({self.name!r})"
+
+    def _load(self, attribute):
+        return getattr(import_module(self.module), attribute)
+
+    @property
+    def context(self):
+        return self._load(self.context_name)
+
+    @property
+    def encrypt(self):
+        return self._load(f"{self.name}_encrypt")
+
+    @property
+    def decrypt(self):
+        return self._load(f"{self.name}_decrypt")
+
+    @property
+    def streams(self):
+        return 'stream' in self.capabilities
+
+    @property
+    def seekable(self):
+        return 'seek' in self.capabilities
+
+    @property
+    def alphabets(self):
+        return 'alphabets' in self.capabilities
+
+_LETTER_KEY = KeyParam("Enter the key (Uppercase letters only): ", str.upper)
+_SEEKABLE = ('stream', 'seek', 'alphabets')
+
+CIPHERS = {cipher.name: cipher for cipher in (
+    Cipher('additive', "Additive Cipher", (KeyParam("Enter the key (integer): ", int),),
+           'AdditiveContext', _SEEKABLE),
+    Cipher('multiplicative', "Multiplicative Cipher",
+           (KeyParam("Enter the key (integer, relatively prime to 26): ", int),), 'MultiplicativeContext', _SEEKABLE),
+    Cipher('affine', "Affine Cipher", (KeyParam("Enter the 'a' key (integer, relatively prime to 26): ", int),
+                                       KeyParam("Enter the 'b' key (integer): ", int)), 'AffineContext', _SEEKABLE),
+    Cipher('monoalphabetic', "Monoalphabetic Substitution Cipher",
+           (KeyParam("Enter the substitution key (26 unique letters): ", str.upper),), 'MonoalphabeticContext',
+           _SEEKABLE),
+    Cipher('autokey', "Autokey Cipher", (_LETTER_KEY,), 'AutokeyContext', ('stream', 'alphabets')),
+    Cipher('vigenere', "Vigenère Cipher", (_LETTER_KEY,), 'VigenereContext', _SEEKABLE),
+    Cipher('playfair', "Playfair Cipher", (_LETTER_KEY,), 'PlayfairContext'),
+    Cipher('keyless_transposition', "Keyless Transposition Cipher", (), 'KeylessTranspositionContext'),
+    Cipher('keyed_transposition', "Keyed Transposition Cipher",
+           (KeyParam("Enter the key (Unique letters): ", str.upper),), 'KeyedTranspositionContext'),
+    Cipher('double_transposition', "Double Transposition Cipher",
+           (KeyParam("Enter the first key (Unique letters): ", str.upper),
+            KeyParam("Enter the second key (Unique letters): ", str.upper)), 'DoubleTranspositionContext'),
+)}
@@ -0,0 +1,316 @@
+import asyncio
+import json
+import os
+import struct
+import sys
+import time
+
+import ciphers
+
+# Encryption service
+# One long-running process answers encrypt and decrypt requests over a local
+# TCP or Unix socket, so callers pay interpreter start-up once. Requests are
+# JSON objects, one per line or each behind a 4-byte big-endian length:
+#   {"id": 1, "op": "encrypt", "cipher": "vigenere", "key": ["LEMON"], "text": "ATTACK"}
+# "alphabet" is optional and takes the same values as --alphabet. Each answer
+# carries the request's id and either "result" or "error"; answers on one
+# connection come back as they finish, not necessarily in order.
+# Requests that arrive together are grouped by cipher, direction and key and
+# run as batches on a pool of worker processes, each of which keeps its
+# compiled contexts warm in cipher_context's LRU cache. At most max_pending
+# requests are accepted at a time; past that the server stops reading from
+# its sockets until answers go out. {"op": "metrics"} reports queue depth,
+# batching, backpressure and cache counters.
+
+MAX_MESSAGE = 1 << 26
+MAX_BATCH = 256
+MAX_BATCH_CHARACTERS = 1 << 20
+BATCH_DELAY = 0.001
+MAX_PENDING = 10_000
+
+_LENGTH = struct.Struct('>I')
+
+def run_batch(groups):
+    # Worker side: groups is [(cipher, command, key, alphabet, texts)], and
+    # the result is ([[(ok, result or error) per text] per group], hits, misses)
+    before = ciphers.cipher_context.cache_info()
+    answers = []
+    for cipher, command, key, alphabet, texts in groups:
+        try:
+            if alphabet is not None:
+                alphabet = ciphers.ALPHABETS.get(alphabet) or ciphers.Alphabet(alphabet)
+            context = ciphers.cipher_context(ciphers.CIPHERS[cipher].context, *ciphers.parse_key(cipher, key, alphabet))
+        except (KeyError, TypeError, ValueError) as e:
+            answers.append([(False, f"invalid key: {e}")] * len(texts))
+            continue
+        transform = context.encrypt_many if command == 'encrypt' else context.decrypt_many
+        try:
+            answers.append([(True, result) for result in transform(texts)])
+        except Exception:
+            # Answer one by one so a bad text does not fail its neighbours
+            answers.append([_transform_one(transform, text) for text in texts])
+    after = ciphers.cipher_context.cache_info()
+    return answers, after.hits - before.hits, after.misses - before.misses
+
+def _transform_one(transform, text):
+    try:
+        return True, transform([text])[0]
+    except Exception as e:
+        return False, str(e) or type(e).__name__
+
+class Metrics:
+    __slots__ = ('started', 'connections', 'requests', 'errors', 'queue_depth', 'max_queue_depth',
+                 'batches', 'batched_requests', 'max_batch_size', 'batches_in_flight', 'backpressure_waits',
+                 'bytes_in', 'bytes_out', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+        self.started = time.monotonic()
+
+    def snapshot(self, queued):
+        result = {name: getattr(self, name) for name in self.__slots__ if name != 'started'}
+        result['uptime'] = round(time.monotonic() - self.started, 3)
+        result['waiting_for_batch'] = queued
+        result['mean_batch_size'] = round(self.batched_requests / self.batches, 2) if self.batches else 0
+        lookups = self.cache_hits + self.cache_misses
+        result['cache_hit_rate'] = round(self.cache_hits / lookups, 4) if lookups else None
+        return result
+
+class Service:
+    __slots__ = ('executor', 'metrics', 'queue', 'pending', 'dispatching', 'max_batch', 'batch_delay', 'tasks')
+
+    def __init__(self, executor, workers, max_batch=MAX_BATCH, batch_delay=BATCH_DELAY, max_pending=MAX_PENDING):
+        self.executor = executor
+        self.metrics = Metrics()
+        self.queue = asyncio.Queue()
+        self.pending = asyncio.Semaphore(max_pending)
+        self.dispatching = asyncio.Semaphore(2 * max(workers, 1))
+        self.max_batch = max_batch
+        self.batch_delay = batch_delay
+        self.tasks = set()
+
+    def _spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def transform(self, command, cipher, key, alphabet, text):
+        # Called with a pending slot held
+        metrics = self.metrics
+        metrics.queue_depth += 1
+        metrics.max_queue_depth = max(metrics.max_queue_depth, metrics.queue_depth)
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(((cipher, command, key, alphabet), text, future))
+        try:
+            return await future
+        finally:
+            metrics.queue_depth -= 1
+
+    async def dispatch(self):
+        queue = self.queue
+        while True:
+            batch = [await queue.get()]
+            if queue.qsize() < self.max_batch and self.batch_delay:
+                await asyncio.sleep(self.batch_delay)  # let concurrent requests join
+            characters = len(batch[0][1])
+            while queue.qsize() and len(batch) < self.max_batch and characters < MAX_BATCH_CHARACTERS:
+                item = queue.get_nowait()
+                batch.append(item)
+                characters += len(item[1])
+            await self.dispatching.acquire()
+            self._spawn(self._run(batch))
+
+    async def _run(self, batch):
+        metrics = self.metrics
+        metrics.batches += 1
+        metrics.batched_requests += len(batch)
+        metrics.max_batch_size = max(metrics.max_batch_size, len(batch))
+        metrics.batches_in_flight += 1
+        groups = {}
+        for group, text, future in batch:
+            texts, futures = groups.setdefault(group, ([], []))
+            texts.append(text)
+            futures.append(future)
+        try:
+            payload = [(*group, texts) for group, (texts, futures) in groups.items()]
+            answers, hits, misses = await asyncio.get_running_loop().run_in_executor(
+                self.executor, run_batch, payload)
+            metrics.cache_hits += hits
+            metrics.cache_misses += misses
+            for (texts, futures), results in zip(groups.values(), answers):
+                for future, result in zip(futures, results):
+                    if not future.done():
+                        future.set_result(result)
+        except Exception as e:
+            for group, text, future in batch:
+                if not future.done():
+                    future.set_result((False, f"worker failed: {e}"))
+        finally:
+            metrics.batches_in_flight -= 1
+            self.dispatching.release()
+
+    async def answer(self, message):
+        # One request message to one answer dict; the caller holds a pending slot
+        try:
+            request = json.loads(message)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            return {'id': None, 'error': f"bad request: {e}"}
+        answer = {'id': request.get('id')}
+        op = request.get('op')
+        if op == 'metrics':
+            answer['result'] = self.metrics.snapshot(self.queue.qsize())
+            return answer
+        if op == 'ping':
+            answer['result'] = 'pong'
+            return answer
+        cipher, key, text = request.get('cipher'), request.get('key', []), request.get('text')
+        alphabet = request.get('alphabet')
+        if op not in ('encrypt', 'decrypt'):
+            answer['error'] = f"unknown op: {op!r}"
+        elif cipher not in ciphers.CIPHERS:
+            answer['error'] = f"unknown cipher: {cipher!r}"
+        elif not isinstance(text, str):
+            answer['error'] = "text must be a string"
+        elif (not isinstance(key, list) or not all(isinstance(value, (str, int)) for value in key)
+              or not isinstance(alphabet, (str, type(None)))):
+            answer['error'] = "key must be a list of strings or integers and alphabet a string"
+        else:
+            ok, result = await self.transform(op, cipher, tuple(key), alphabet, text)
+            answer['result' if ok else 'error'] = result
+        return answer
+
+    async def handle(self, reader, writer, framing):
+        metrics = self.metrics
+        metrics.connections += 1
+        read = _read_line if framing == 'line' else _read_frame
+        draining = asyncio.Lock()
+        replies = set()
+
+        async def reply(message):
+            try:
+                answer = await self.answer(message)
+            finally:
+                self.pending.release()
+            metrics.requests += 1
+            metrics.errors += 'error' in answer
+            data = _frame(answer, framing)
+            metrics.bytes_out += len(data)
+            writer.write(data)
+            async with draining:
+                await writer.drain()
+
+        try:
+            while True:
+                try:
+                    message = await read(reader)
+                except ValueError as e:
+                    writer.write(_frame({'id': None, 'error': str(e)}, framing))
+                    break
+                if message is None:
+                    break
+                metrics.bytes_in += len(message)
+                if self.pending.locked():
+                    metrics.backpressure_waits += 1
+                await self.pending.acquire()
+                task = self._spawn(reply(message))
+                replies.add(task)
+                task.add_done_callback(replies.discard)
+            if replies:
+                await asyncio.gather(*replies, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            metrics.connections -= 1
+            writer.close()
+
+def _frame(answer, framing):
+    data = json.dumps(answer, ensure_ascii=False).encode('utf-8')
+    return data + b'\n' if framing == 'line' else _LENGTH.pack(len(data)) + data
+
+async def _read_line(reader):
+    # Next non-blank line, or None at end of input
+    while True:
+        try:
+            line = await reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError as e:
+            line = e.partial
+        except asyncio.LimitOverrunError:
+            raise ValueError(f"request longer than {MAX_MESSAGE} bytes") from None
+        if not line:
+            return None
+        if line.strip():
+            return line
+
+async def _read_frame(reader):
+    try:
+        header = await reader.readexactly(_LENGTH.size)
+    except asyncio.IncompleteReadError:
+        return None
+    length, = _LENGTH.unpack(header)
+    if length > MAX_MESSAGE:
+        raise ValueError(f"request longer than {MAX_MESSAGE} bytes")
+    return await reader.readexactly(length)
+
+async def serve(host='127.0.0.1', port=8765, unix=None, framing='line', workers=None, max_batch=MAX_BATCH,
+                batch_delay=BATCH_DELAY, max_pending=MAX_PENDING, ready=None):
+    # Runs until cancelled. ready, if given, is called with the listening server.
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # workers=0 runs batches on one thread of this process
+    executor = ProcessPoolExecutor(max_workers=workers) if workers else ThreadPoolExecutor(max_workers=1)
+    with executor:
+        # Start the workers before any socket is open: forked workers would
+        # otherwise inherit client connections and keep them from closing
+        await asyncio.get_running_loop().run_in_executor(executor, run_batch, [])
+        service = Service(executor, workers, max_batch, batch_delay, max_pending)
+
+        def connected(reader, writer):
+            return service.handle(reader, writer, framing)
+
+        if unix:
+            server = await asyncio.start_unix_server(connected, unix, limit=MAX_MESSAGE)
+        else:
+            server = await asyncio.start_server(connected, host, port, limit=MAX_MESSAGE)
+        dispatcher = asyncio.ensure_future(service.dispatch())
+        try:
+            async with server:
+                if ready is not None:
+                    ready(server)
+                await server.serve_forever()
+        finally:
+            dispatcher.cancel()
+
+def main_server(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve encrypt and decrypt requests over a local socket")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="listen on this Unix socket path instead of TCP")
+    parser.add_argument('--framing', choices=['line', 'length'], default='line',
+                        help="one JSON request per line, or each behind a 4-byte big-endian length")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count; 0 runs in-process)")
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help="most requests per batch")
+    parser.add_argument('--batch-delay', type=float, default=BATCH_DELAY,
+                        help="seconds to wait for more requests before dispatching a batch")
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING,
+                        help="requests accepted before the server stops reading")
+    options = parser.parse_args(argv)
+
+    def ready(server):
+        where = options.unix or f"{options.host}:{options.port}"
+        print(f"Listening on {where} ({options.framing} framing)", file=sys.stderr)
+
+    try:
+        asyncio.run(serve(options.host, options.port, options.unix, options.framing, options.workers,
+                          options.max_batch, options.batch_delay, options.max_pending, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_server())
@@ -0,0 +1,641 @@
+import math
+import os
+import random
+import re
+import time
+from collections import Counter, namedtuple
+from functools import lru_cache
+from operator import add, itemgetter
+
+import ciphers
+import ngrams
+
+# Key search for ciphers that are too large to brute force
+# Candidates are scored with log-probabilities of English quadgrams, so
+# unlike analysis.py higher scores are better here.
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'english.txt')
+
+# Letters of the ciphertext used for the search; the key found is then
+# applied to the whole text
+SEARCH_SAMPLE = 4000
+
+_NOT_LETTER = re.compile('[^A-Z]+')
+_LETTER_CODES = bytes(code - 65 if 65 <= code <= 90 else 0 for code in range(256))
+
+def letter_codes(text):
+    # 0-25 for each uppercase letter A-Z, everything else dropped
+    return _NOT_LETTER.sub('', text).encode('ascii').translate(_LETTER_CODES)
+
+@lru_cache(maxsize=None)
+def quadgram_scores(corpus=CORPUS):
+    # Flat table of log10 probabilities indexed by a * 26**3 + b * 26**2 + c * 26 + d,
+    # with quadgrams missing from the corpus scored as a tenth of a sighting
+    return ngrams.corpus_counts(corpus).log_probabilities(4)
+
+# Monoalphabetic substitution
+SubstitutionSolution = namedtuple('SubstitutionSolution', 'key plaintext score climbs elapsed')
+
+class _SubstitutionClimber:
+    # Hill climbing over decryption mappings plain[cipher_letter]. The sample
+    # is reduced to its distinct quadgrams with their counts, and each cipher
+    # letter keeps the quadgrams it appears in, so scoring a swap of two
+    # letters only revisits the quadgrams that contain one of them.
+    __slots__ = ('scores', 'quadgrams', 'masks', 'by_letter', 'plain', 'contributions', 'score')
+
+    def __init__(self, codes, scores):
+        counts = Counter(codes[i:i + 4] for i in range(len(codes) - 3))
+        self.scores = scores
+        self.quadgrams = list(counts.items())
+        self.masks = [(1 << a) | (1 << b) | (1 << c) | (1 << d) for (a, b, c, d), _ in self.quadgrams]
+        self.by_letter = [[] for _ in range(26)]
+        for index, mask in enumerate(self.masks):
+            for letter in range(26):
+                if mask >> letter & 1:
+                    self.by_letter[letter].append(index)
+        self.plain = list(range(26))
+        self.contributions = [0.0] * len(self.quadgrams)
+        self.score = 0.0
+
+    def _contribution(self, index):
+        (a, b, c, d), count = self.quadgrams[index]
+        plain = self.plain
+        return count * self.scores[((plain[a] * 26 + plain[b]) * 26 + plain[c]) * 26 + plain[d]]
+
+    def reset(self, plain):
+        self.plain = list(plain)
+        self.contributions = [self._contribution(index) for index in range(len(self.quadgrams))]
+        self.score = sum(self.contributions)
+
+    def _swap_delta(self, x, y):
+        # Score change if cipher letters x and y exchanged plaintext letters;
+        # the mapping is left swapped for the caller to keep or undo
+        plain, quadgrams, scores, contributions = self.plain, self.quadgrams, self.scores, self.contributions
+        plain[x], plain[y] = plain[y], plain[x]
+        delta = 0.0
+        for index in self.by_letter[x]:
+            (a, b, c, d), count = quadgrams[index]
+            delta += count * scores[((plain[a] * 26 + plain[b]) * 26 + plain[c]) * 26 + plain[d]] - contributions[index]
+        x_bit, masks = 1 << x, self.masks
+        for index in self.by_letter[y]:
+            if masks[index] & x_bit:
+                continue
+            (a, b, c, d), count = quadgrams[index]
+            delta += count * scores[((plain[a] * 26 + plain[b]) * 26 + plain[c]) * 26 + plain[d]] - contributions[index]
+        return delta
+
+    def _commit(self, x, y, delta):
+        contributions = self.contributions
+        for index in self.by_letter[x]:
+            contributions[index] = self._contribution(index)
+        for index in self.by_letter[y]:
+            contributions[index] = self._contribution(index)
+        self.score += delta
+
+    def climb(self, plain, rnd):
+        # Swap pairs of letters until a full pass over all pairs finds no gain
+        self.reset(plain)
+        pairs = [(x, y) for x in range(26) for y in range(x + 1, 26)
+                 if self.by_letter[x] or self.by_letter[y]]
+        improved = True
+        while improved:
+            improved = False
+            rnd.shuffle(pairs)
+            for x, y in pairs:
+                delta = self._swap_delta(x, y)
+                if delta > 1e-9:
+                    self._commit(x, y, delta)
+                    improved = True
+                else:
+                    plain = self.plain
+                    plain[x], plain[y] = plain[y], plain[x]
+        return self.score, list(self.plain)
+
+def _frequency_mapping(codes):
+    # Start from the cipher letters matched to English letters by frequency
+    from analysis import ENGLISH_FREQUENCIES
+    english = sorted(range(26), key=lambda p: -ENGLISH_FREQUENCIES[p])
+    cipher = sorted(range(26), key=lambda c: -codes.count(c))
+    plain = [0] * 26
+    for c, p in zip(cipher, english):
+        plain[c] = p
+    return plain
+
+def substitution_key(plain):
+    # Cipher alphabet in the form monoalphabetic_encrypt takes
+    key = [''] * 26
+    for cipher_letter, plain_letter in enumerate(plain):
+        key[plain_letter] = chr(65 + cipher_letter)
+    return ''.join(key)
+
+def _search(worker, jobs, seed, *args):
+    # Run worker(*args, seed, first) in jobs processes with distinct seeds;
+    # worker 0 gets first=True so it can try a deterministic start
+    if jobs <= 1:
+        return [worker(*args, seed, True)]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(worker, *args, seed + i, i == 0) for i in range(jobs)]
+        return [future.result() for future in futures]
+
+def _climb_substitution(codes, time_budget, corpus, seed, from_frequencies):
+    # Random-restart hill climbing until the budget is spent; one process's share
+    deadline = time.perf_counter() + time_budget
+    rnd = random.Random(seed)
+    climber = _SubstitutionClimber(codes, quadgram_scores(corpus))
+    best_score, best_plain, climbs = -math.inf, list(range(26)), 0
+    while True:
+        if from_frequencies and not climbs:
+            start = _frequency_mapping(codes)
+        else:
+            start = list(range(26))
+            rnd.shuffle(start)
+        score, plain = climber.climb(start, rnd)
+        climbs += 1
+        if score > best_score:
+            best_score, best_plain = score, plain
+        if time.perf_counter() >= deadline:
+            return best_score, best_plain, climbs
+
+def solve_substitution(ciphertext, time_budget=10.0, jobs=1, seed=None, sample_size=SEARCH_SAMPLE, corpus=CORPUS):
+    # Best monoalphabetic key found within time_budget seconds, with restarts
+    # spread over jobs processes. score is the mean log10 quadgram probability.
+    start = time.perf_counter()
+    codes = letter_codes(ciphertext[:sample_size * 2])[:sample_size]
+    if len(codes) < 4:
+        raise ValueError("ciphertext needs at least 4 letters")
+    quadgram_scores(corpus)  # load once here so forked workers inherit it
+    seed = random.randrange(1 << 32) if seed is None else seed
+    results = _search(_climb_substitution, jobs, seed, codes, time_budget, corpus)
+    score, plain, _ = max(results, key=lambda result: result[0])
+    key = substitution_key(plain)
+    return SubstitutionSolution(key, ciphers.monoalphabetic_decrypt(ciphertext, key), score / (len(codes) - 3),
+                                sum(result[2] for result in results), time.perf_counter() - start)
+
+# Playfair
+PlayfairSolution = namedtuple('PlayfairSolution', 'key plaintext score runs elapsed')
+
+PLAYFAIR_ITERATIONS = 100_000
+PLAYFAIR_SAMPLE = 600
+_PLAYFAIR_LETTERS = [letter for letter in range(26) if letter != 9]  # No J
+_ROW = [cell // 5 for cell in range(25)]
+_COL = [cell % 5 for cell in range(25)]
+_LEFT = [row * 5 + (col - 1) % 5 for row, col in zip(_ROW, _COL)]
+_UP = [((row - 1) % 5) * 5 + col for row, col in zip(_ROW, _COL)]
+
+class _PlayfairAnnealer:
+    # The square is the row-major letter list of ciphers._playfair_table, as
+    # letter codes, with a coordinate index pos[letter] -> cell kept beside
+    # it. The ciphertext is reduced to its distinct digraphs; a candidate is
+    # decrypted by rewriting plain[k] for each distinct digraph k in place,
+    # and scored from counted digraph pairs (aligned quadgrams) and triples
+    # (quadgrams straddling three digraphs), so one iteration allocates no
+    # lists or strings however long the ciphertext is.
+    __slots__ = ('scores', 'digraphs', 'pairs', 'triples', 'plain', 'low', 'high', 'square', 'pos')
+
+    def __init__(self, codes, scores):
+        codes = codes.replace(b'\x09', b'\x08')  # J reads as I
+        sequence = [codes[i:i + 2] for i in range(0, len(codes) - 1, 2)]
+        index = {}
+        ids = [index.setdefault(digraph, len(index)) for digraph in sequence]
+        self.scores = scores
+        self.digraphs = list(index)
+        self.pairs = list(Counter(zip(ids, ids[1:])).items())
+        self.triples = list(Counter(zip(ids, ids[1:], ids[2:])).items())
+        self.plain = [0] * len(index)
+        self.low = [0] * len(index)
+        self.high = [0] * len(index)
+        self.square = list(_PLAYFAIR_LETTERS)
+        self.pos = [0] * 26
+
+    def set_square(self, square):
+        self.square[:] = square
+        for cell, letter in enumerate(self.square):
+            self.pos[letter] = cell
+
+    def fitness(self):
+        square, pos, plain, low, high = self.square, self.pos, self.plain, self.low, self.high
+        for k, (a, b) in enumerate(self.digraphs):
+            x, y = pos[a], pos[b]
+            if _ROW[x] == _ROW[y]:
+                p, q = square[_LEFT[x]], square[_LEFT[y]]
+            elif _COL[x] == _COL[y]:
+                p, q = square[_UP[x]], square[_UP[y]]
+            else:
+                p, q = square[x - _COL[x] + _COL[y]], square[y - _COL[y] + _COL[x]]
+            plain[k] = p * 26 + q
+            low[k] = q * 17576
+            high[k] = p
+        scores = self.scores
+        total = 0.0
+        for (j, k), count in self.pairs:
+            total += count * scores[plain[j] * 676 + plain[k]]
+        for (i, j, k), count in self.triples:
+            total += count * scores[low[i] + plain[j] * 26 + high[k]]
+        return total
+
+    def mutate(self, rnd):
+        # Apply a random move in place and return it; every move is its own inverse
+        choice = rnd.random()
+        if choice < 0.9:
+            move = (0, rnd.randrange(25), rnd.randrange(25))
+        elif choice < 0.94:
+            move = (1, rnd.randrange(5), rnd.randrange(5))
+        elif choice < 0.98:
+            move = (2, rnd.randrange(5), rnd.randrange(5))
+        else:
+            move = (3 + rnd.randrange(3), 0, 0)
+        self.apply(move)
+        return move
+
+    def apply(self, move):
+        kind, i, j = move
+        square, pos = self.square, self.pos
+        if kind == 0:  # Swap two cells
+            square[i], square[j] = square[j], square[i]
+            pos[square[i]], pos[square[j]] = i, j
+            return
+        if kind == 1:  # Swap two rows
+            square[i * 5:i * 5 + 5], square[j * 5:j * 5 + 5] = square[j * 5:j * 5 + 5], square[i * 5:i * 5 + 5]
+        elif kind == 2:  # Swap two columns
+            square[i::5], square[j::5] = square[j::5], square[i::5]
+        elif kind == 3:  # Reverse the square
+            square.reverse()
+        elif kind == 4:  # Flip top to bottom
+            for row in range(2):
+                top, bottom = row * 5, (4 - row) * 5
+                square[top:top + 5], square[bottom:bottom + 5] = square[bottom:bottom + 5], square[top:top + 5]
+        else:  # Flip left to right
+            for row in range(5):
+                square[row * 5:row * 5 + 5] = square[row * 5 + 4:row * 5 - 1 if row else None:-1]
+        for cell, letter in enumerate(square):
+            pos[letter] = cell
+
+    def anneal(self, square, iterations, temperature, rnd, deadline=math.inf):
+        # Linear cooling from temperature to 0; worse squares are accepted
+        # with probability exp(delta / T). Stops early at the deadline.
+        self.set_square(square)
+        score = self.fitness()
+        best_score, best_square = score, list(self.square)
+        exp, random_ = math.exp, rnd.random
+        for step in range(iterations):
+            if not step & 1023 and time.perf_counter() >= deadline:
+                break
+            t = temperature * (1 - step / iterations)
+            move = self.mutate(rnd)
+            candidate = self.fitness()
+            delta = candidate - score
+            if delta >= 0 or (t > 0 and random_() < exp(delta / t)):
+                score = candidate
+                if score > best_score:
+                    best_score, best_square = score, list(self.square)
+            else:
+                self.apply(move)
+        return best_score, best_square
+
+def playfair_key(square):
+    # A square's letters are also a key that rebuilds it
+    return ''.join(chr(65 + letter) for letter in square)
+
+def _anneal_playfair(codes, time_budget, iterations, temperature, corpus, seed, first):
+    # Annealing runs until the budget is spent, the first from a random square
+    # and each later one reheating the best square so far
+    deadline = time.perf_counter() + time_budget
+    rnd = random.Random(seed)
+    annealer = _PlayfairAnnealer(codes, quadgram_scores(corpus))
+    best_score, best_square, runs = -math.inf, list(_PLAYFAIR_LETTERS), 0
+    rnd.shuffle(best_square)
+    while True:
+        score, square = annealer.anneal(best_square, iterations, temperature, rnd, deadline)
+        runs += 1
+        if score > best_score:
+            best_score, best_square = score, square
+        if time.perf_counter() >= deadline:
+            return best_score, best_square, runs
+
+def solve_playfair(ciphertext, time_budget=60.0, jobs=1, seed=None, iterations=PLAYFAIR_ITERATIONS,
+                   temperature=None, sample_size=PLAYFAIR_SAMPLE, corpus=CORPUS):
+    # Best Playfair square found by simulated annealing within time_budget
+    # seconds, with independent runs on jobs processes. The default starting
+    # temperature grows with the sample length, since score differences do.
+    start = time.perf_counter()
+    codes = letter_codes(ciphertext[:sample_size * 2])[:sample_size & ~1]
+    if len(codes) < 6:
+        raise ValueError("ciphertext needs at least 6 letters")
+    if temperature is None:
+        temperature = 10 + 0.087 * (len(codes) - 84)
+    quadgram_scores(corpus)
+    seed = random.randrange(1 << 32) if seed is None else seed
+    results = _search(_anneal_playfair, jobs, seed, codes, time_budget, iterations, temperature, corpus)
+
+    score, square, _ = max(results, key=lambda result: result[0])
+    key = playfair_key(square)
+    letters = _NOT_LETTER.sub('', ciphertext.upper()).replace('J', 'I')
+    plaintext = ciphers.playfair_decrypt(letters[:len(letters) & ~1], key)
+    return PlayfairSolution(key, plaintext, score / (len(codes) - 3),
+                            sum(result[2] for result in results), time.perf_counter() - start)
+
+# Double transposition
+# A candidate is a pair of column orders, the reading order keyed_permutation
+# derives from a key. Decryption gathers twice: the key2 pass, then (after
+# the trailing 'X' it leaves are stripped) the key1 pass. Each key's gather
+# is expanded once into a tuple of source indices and cached, the pair is
+# composed into one tuple with a single C-level gather, and the plaintext
+# is scored with map() pipelines over precomputed tables, so no Python code
+# runs per ciphertext character.
+TranspositionSolution = namedtuple('TranspositionSolution', 'key1 key2 plaintext score candidates rate elapsed')
+
+TRANSPOSITION_CACHE_SIZE = 1 << 14
+_TIMES_26 = [code * 26 for code in range(26)]
+_TIMES_676 = [pair * 676 for pair in range(676)]
+_X = 23
+
+@lru_cache(maxsize=None)
+def bigram_scores(corpus=CORPUS):
+    # Flat table of log10 bigram probabilities indexed by a * 26 + b
+    return ngrams.corpus_counts(corpus).log_probabilities(2)
+
+def order_key(order):
+    # A key whose column reading order is order
+    key = [''] * len(order)
+    for rank, col in enumerate(order):
+        key[col] = chr(65 + rank)
+    return ''.join(key)
+
+class _TranspositionScorer:
+    __slots__ = ('codes', 'length', 'statistic', 'scores', 'candidates', 'first_pass', 'second_pass', 'scored')
+
+    def __init__(self, ciphertext, statistic, corpus):
+        # Characters other than A-Z score as 'X'
+        table = bytes(code - 65 if 65 <= code <= 90 else _X for code in range(256))
+        self.codes = ciphertext.encode('ascii', 'replace').translate(table)
+        self.length = len(self.codes)
+        self.statistic = statistic
+        self.scores = quadgram_scores(corpus) if statistic == 'quadgram' else bigram_scores(corpus)
+        self.candidates = 0
+        self.first_pass = lru_cache(maxsize=TRANSPOSITION_CACHE_SIZE)(self._first_pass)
+        self.second_pass = lru_cache(maxsize=TRANSPOSITION_CACHE_SIZE)(self._second_pass)
+        self.scored = lru_cache(maxsize=TRANSPOSITION_CACHE_SIZE)(self._score)
+
+    def _first_pass(self, order2):
+        # key2 decryption gather, and how many trailing 'X' it leaves
+        indices = ciphers.keyed_permutation(order_key(order2), self.length, 'decrypt').indices()
+        codes, stripped = self.codes, 0
+        while stripped < len(indices) and codes[indices[-1 - stripped]] == _X:
+            stripped += 1
+        return tuple(indices), stripped
+
+    def _second_pass(self, order1, length):
+        return ciphers.keyed_permutation(order_key(order1), length, 'decrypt').indices()
+
+    def plaintext_codes(self, order1, order2):
+        first, stripped = self.first_pass(order2)
+        length = self.length - stripped
+        if length < 4:
+            return b''
+        composed = itemgetter(*self.second_pass(order1, length))(first)
+        return bytes(itemgetter(*composed)(self.codes))
+
+    def _score(self, order1, order2):
+        self.candidates += 1
+        codes = self.plaintext_codes(order1, order2)
+        if not codes:
+            return -math.inf
+        pairs = list(map(add, map(_TIMES_26.__getitem__, codes), codes[1:]))
+        if self.statistic == 'quadgram':
+            pairs = map(add, map(_TIMES_676.__getitem__, pairs), pairs[2:])
+        return sum(map(self.scores.__getitem__, pairs)) / len(codes)
+
+def _neighbours(order, rnd):
+    # A random swap of two columns, one column moved elsewhere, or a
+    # rotation of the whole order
+    order = list(order)
+    i, j = rnd.sample(range(len(order)), 2)
+    choice = rnd.random()
+    if choice < 0.4:
+        order[i], order[j] = order[j], order[i]
+    elif choice < 0.8:
+        order.insert(j, order.pop(i))
+    else:
+        order = order[i:] + order[:i]
+    return tuple(order)
+
+def _climb_transposition(ciphertext, lengths, time_budget, patience, statistic, corpus, seed, first):
+    # Random-restart hill climbing over both column orders, sharing the time
+    # budget evenly between the (length1, length2) pairs
+    rnd = random.Random(seed)
+    scorer = _TranspositionScorer(ciphertext, statistic, corpus)
+    best = (-math.inf, (0,), (0,))
+    for length1, length2 in lengths:
+        deadline = time.perf_counter() + time_budget / len(lengths)
+        while time.perf_counter() < deadline:
+            order1, order2 = tuple(rnd.sample(range(length1), length1)), tuple(rnd.sample(range(length2), length2))
+            score, failures = scorer.scored(order1, order2), 0
+            while failures < patience and time.perf_counter() < deadline:
+                if length1 > 1 and (length2 < 2 or rnd.random() < 0.5):
+                    candidate = _neighbours(order1, rnd), order2
+                elif length2 > 1:
+                    candidate = order1, _neighbours(order2, rnd)
+                else:
+                    break
+                candidate_score = scorer.scored(*candidate)
+                if candidate_score > score:
+                    (order1, order2), score, failures = candidate, candidate_score, 0
+                else:
+                    failures += 1
+            if score > best[0]:
+                best = (score, order1, order2)
+    return best, scorer.candidates
+
+def _try_dictionary(ciphertext, keys1, keys2, statistic, corpus, seed, first):
+    # Every pair of keywords; seed and first are unused
+    scorer = _TranspositionScorer(ciphertext, statistic, corpus)
+    best = (-math.inf, '', '')
+    for key2 in keys2:
+        for key1 in keys1:
+            score = scorer.scored(key_order(key1), key_order(key2))
+            if score > best[0]:
+                best = (score, key1, key2)
+    return best, scorer.candidates
+
+def key_order(key):
+    # Column reading order of a cleaned key, as keyed_permutation sorts it
+    return tuple(sorted(range(len(key)), key=lambda col: key[col]))
+
+def solve_double_transposition(ciphertext, lengths1, lengths2, time_budget=10.0, jobs=1, seed=None,
+                               statistic='quadgram', patience=2000, words=None, corpus=CORPUS):
+    # Best key pair with key1 length in lengths1 and key2 length in lengths2.
+    # With words, every pair of words with those lengths is tried instead of
+    # searching. rate is candidates scored per second over all processes.
+    start = time.perf_counter()
+    ciphertext = ciphers.clean_text(ciphertext)
+    (quadgram_scores if statistic == 'quadgram' else bigram_scores)(corpus)
+    if words is not None:
+        words = sorted({ciphers.clean_text(word) for word in words})
+        keys1 = [word for word in words if len(word) in lengths1]
+        keys2 = [word for word in words if len(word) in lengths2]
+        if not keys1 or not keys2:
+            raise ValueError("no words of the given key lengths")
+        # Shard the key2 words so each process takes every jobs-th one
+        shards = max(1, min(jobs, len(keys2)))
+        if shards <= 1:
+            results = [_try_dictionary(ciphertext, keys1, keys2, statistic, corpus, 0, True)]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=shards) as pool:
+                futures = [pool.submit(_try_dictionary, ciphertext, keys1, keys2[i::shards], statistic, corpus, 0, True)
+                           for i in range(shards)]
+                results = [future.result() for future in futures]
+        (score, key1, key2), _ = max(results, key=lambda result: result[0][0])
+    else:
+        pairs = [(length1, length2) for length1 in lengths1 for length2 in lengths2]
+        if not pairs:
+            raise ValueError("no key lengths to search")
+        seed = random.randrange(1 << 32) if seed is None else seed
+        results = _search(_climb_transposition, jobs, seed, ciphertext, pairs, time_budget, patience, statistic,
+                          corpus)
+        (score, order1, order2), _ = max(results, key=lambda result: result[0][0])
+        key1, key2 = order_key(order1), order_key(order2)
+
+    elapsed = time.perf_counter() - start
+    candidates = sum(result[1] for result in results)
+    return TranspositionSolution(key1, key2, ciphers.double_transposition_decrypt(ciphertext, key1, key2), score,
+                                 candidates, candidates / elapsed if elapsed else 0.0, elapsed)
+
+# Wordlist attack on Vigenère and autokey
+# With a key of length L, plaintext column j (positions j, j + L, ...) of
+# either cipher depends on key letter j alone: Vigenère subtracts it from
+# every letter of the column, and autokey alternately subtracts and adds it
+# after unwinding the running key. So one table per key length, built from
+# the ciphertext prefix, scores a word by summing one entry per key letter,
+# and words that cannot enter the current top `keep` are dropped before any
+# decryption. Survivors are rescored with quadgrams on the decrypted prefix
+# and only the best few are decrypted in full.
+DictionaryCandidate = namedtuple('DictionaryCandidate', 'key score plaintext')
+DictionaryResult = namedtuple('DictionaryResult', 'candidates words survivors elapsed')
+
+DICTIONARY_PREFIX = 400
+DICTIONARY_KEEP = 1000
+DICTIONARY_MAX_KEY = 100
+
+class _ColumnScorer:
+    __slots__ = ('cipher', 'values', 'letters', 'tables')
+
+    def __init__(self, prefix, cipher):
+        from analysis import _ENGLISH_LOGS
+        self.cipher = cipher
+        self.letters = _ENGLISH_LOGS
+        if cipher == 'vigenere':
+            # Only uppercase ASCII letters are shifted and counted
+            self.values = [ord(char) - 65 if 'A' <= char <= 'Z' else None for char in prefix]
+        else:
+            # Autokey works mod 26 on every character
+            self.values = [(ord(char) - 65) % 26 for char in prefix]
+        self.tables = {}
+
+    def _column_scores(self, column, length):
+        # scores[s]: log-likelihood of the column decrypted with key value s
+        values = self.values[column::length]
+        even, odd = [0] * 26, [0] * 26
+        if self.cipher == 'vigenere':
+            for value in values:
+                if value is not None:
+                    even[value] += 1
+        else:
+            unwound = 0
+            for m, value in enumerate(values):
+                unwound = (value - unwound) % 26
+                (odd if m & 1 else even)[unwound] += 1
+        logs = self.letters
+        return [sum(count * logs[(value - s) % 26] for value, count in enumerate(even) if count) +
+                sum(count * logs[(value + s) % 26] for value, count in enumerate(odd) if count)
+                for s in range(26)]
+
+    def table(self, length):
+        # Flat table: entry column * 256 + byte is the column's score with
+        # that key character, for keys given as bytes
+        table = self.tables.get(length)
+        if table is None:
+            table = []
+            for column in range(length):
+                scores = self._column_scores(column, length)
+                table.extend(scores[(code - 65) % 26] for code in range(256))
+            self.tables[length] = table
+        return table
+
+def _wordlist_shards(path, jobs):
+    # Byte ranges of roughly equal size; a line belongs to the shard its first byte is in
+    size = os.path.getsize(path)
+    bounds = [size * i // jobs for i in range(jobs + 1)]
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+def _key_bytes(line):
+    # The key the ciphers would use for a wordlist line, as bytes
+    line = line.strip()
+    if line.isascii():
+        return line.replace(b' ', b'').upper()
+    key = ciphers.clean_text(line.decode('utf-8', 'replace'))
+    # Only the value mod 26 matters, so fold other characters into A-Z
+    return bytes((ord(char) - 65) % 26 + 65 for char in key)
+
+def _scan_wordlist(prefix, cipher, path, start, end, keep, max_key):
+    # Top `keep` (score, word) over the lines starting in [start, end)
+    import heapq
+    scorer = _ColumnScorer(prefix, cipher)
+    best, words = [], 0
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position = start
+        if start:
+            # The line under start began in the previous shard
+            f.seek(start - 1)
+            position = start - 1 + len(f.readline())
+        tables, table = scorer.tables, scorer.table
+        for line in f:
+            if position >= end:
+                break
+            position += len(line)
+            key = _key_bytes(line)
+            length = len(key)
+            if not length or length > max_key:
+                continue
+            words += 1
+            score = sum(map((tables.get(length) or table(length)).__getitem__, map(add, range(0, length << 8, 256), key)))
+            if len(best) < keep:
+                heapq.heappush(best, (score, line.strip()))
+            elif score > best[0][0]:
+                heapq.heapreplace(best, (score, line.strip()))
+    return best, words
+
+def dictionary_attack(ciphertext, wordlist, cipher='vigenere', top=5, jobs=1, keep=DICTIONARY_KEEP,
+                      prefix_size=DICTIONARY_PREFIX, max_key=DICTIONARY_MAX_KEY, corpus=CORPUS):
+    # Rank the words of a wordlist file as Vigenère or autokey keys. The file
+    # is split into byte ranges scanned by jobs processes.
+    start = time.perf_counter()
+    decrypt = {'vigenere': ciphers.vigenere_decrypt, 'autokey': ciphers.autokey_decrypt}[cipher]
+    prefix = ciphertext[:prefix_size]
+    shards = _wordlist_shards(wordlist, max(1, jobs))
+    if len(shards) <= 1:
+        results = [_scan_wordlist(prefix, cipher, wordlist, 0, os.path.getsize(wordlist), keep, max_key)]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+            futures = [pool.submit(_scan_wordlist, prefix, cipher, wordlist, low, high, keep, max_key)
+                       for low, high in shards]
+            results = [future.result() for future in futures]
+
+    # Rescore the survivors with quadgrams on their decrypted prefix
+    scores = quadgram_scores(corpus)
+    survivors = {line.decode('utf-8', 'replace') for best, _ in results for _, line in best}
+    ranked = []
+    for word in survivors:
+        codes = letter_codes(decrypt(prefix, word))
+        if len(codes) < 4:
+            continue
+        pairs = list(map(add, map(_TIMES_26.__getitem__, codes), codes[1:]))
+        quads = map(add, map(_TIMES_676.__getitem__, pairs), pairs[2:])
+        ranked.append((sum(map(scores.__getitem__, quads)) / (len(codes) - 3), word))
+    ranked.sort(reverse=True)
+    candidates = [DictionaryCandidate(word, score, decrypt(ciphertext, word)) for score, word in ranked[:top]]
+    return DictionaryResult(candidates, sum(result[1] for result in results), len(survivors),
+                            time.perf_counter() - start)